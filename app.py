@@ -1,204 +1,174 @@
 # Clue & Cue
 # app.py
 # ---------------- IMPORTS ---------------- #
-from flask import Flask, render_template, request, redirect, url_for
-from flask_socketio import SocketIO, join_room, emit
-from game.engine import Room
+from flask import Flask, Response, jsonify, render_template, request, redirect, url_for
+from flask_socketio import SocketIO
+from game.assets import AssetPipeline
+from game.metrics import Metrics
+from game.background import run_here
+from game.server import GameServer
+from game import wire
+from concurrent.futures import ThreadPoolExecutor
 import os
 
 # ---------------- FLASK CONFIG ---------------- #
-app = Flask(__name__)
+app = Flask(__name__, static_folder=None)  # /static is served from ASSETS below
 # Use environment variable on server, or 'dev' for local testing
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev_secret_key")
-socketio = SocketIO(app)
 
-# Global dictionary to store active Room objects
-# Key: Room Code (str), Value: Room (Object)
-ROOMS = {}
+# static/ read and gzipped once, served under content-hashed names; rendered pages cached too
+ASSETS = AssetPipeline(os.path.join(app.root_path, "static"))
+app.jinja_env.globals["asset_url"] = ASSETS.url
 
+# Per-event counts, latencies and payload sizes, served on /metrics
+METRICS = Metrics()
 
-# ---------------- ROUTES ---------------- #
+# Multi-process mode: workers share broadcasts through a message queue
+# (e.g. 'redis://localhost:6379/0' or 'zmq+tcp://127.0.0.1:5555+5556', see cluster.py)
+socketio = SocketIO(app, message_queue=os.environ.get("SOCKETIO_MESSAGE_QUEUE"), json=METRICS.json_module())
 
-@app.route("/")
-def index():
-    """Renders the Home/Lobby page."""
-    return render_template("index.html")
 
+class SocketIOTransport:
+    """How the GameServer reaches Flask-SocketIO clients (see game/server.py)."""
 
-@app.route("/rules")
-def rules():
-    """Renders the Rules page."""
-    return render_template("rules.html")
+    def emit(self, event, data, to, skip_sid=None):
+        socketio.emit(event, data, to=to, skip_sid=skip_sid)
 
+    def fan_out(self, event, data, to):
+        socketio.start_background_task(socketio.emit, event, data, to=to)
 
-@app.route("/game/<roomcode>")
-def game_ui(roomcode):
-    """
-    Renders the main Game Interface.
-    Checks if the room exists; if not, redirects back to Home.
-    """
-    if roomcode not in ROOMS:
-        return redirect(url_for('index'))
-    return render_template("game.html", roomcode=roomcode)
+    def enter_room(self, sid, name):
+        # join_room() needs the app context, which a pool thread doesn't have
+        socketio.server.enter_room(sid, name, namespace="/")
 
+    def close_room(self, name):
+        socketio.close_room(name)
 
-# ---------------- SOCKET.IO EVENTS ---------------- #
 
-@socketio.on("create_room")
-def handle_create(data):
+def blocking_io():
     """
-    Creates a new game room with a random 4-letter code.
-    Adds the creator as the first player.
+    How the journal (fsyncs, snapshot pickling) and the pack library (parsing, deck builds)
+    run their slow work. Under eventlet their loops are greenlets, so that work goes to
+    eventlet's native thread pool instead of stopping the hub.
     """
-    username = data.get("username")
-    print(f"[DEBUG] Creating room for user: {username}")  # LOG
-
-    import random, string
-    roomcode = ''.join(random.choices(string.ascii_uppercase, k=4))
+    if socketio.async_mode == "eventlet":
+        from eventlet import tpool
+        return tpool.execute
+    return run_here
 
-    new_room = Room(roomcode, username)
-    ROOMS[roomcode] = new_room
 
-    emit("room_created", {"roomcode": roomcode})
-
-
-@socketio.on("join_game")
-def handle_join(data):
-    """
-    Handles a player joining an existing room.
-    Associates the socket session ID (sid) with the player for private messaging.
-    """
-    roomcode = data.get("roomcode")
-    username = data.get("username")
+# Rooms, mailboxes, timers, journal and every Socket.IO handler, shared with asgi_app.py.
+# With the threading async_mode, ROOM_THREADS runs the room mailboxes on a pool
+# (rooms in parallel, each one in order).
+GAME = GameServer(
+    SocketIOTransport(), METRICS,
+    executor=ThreadPoolExecutor(int(os.environ["ROOM_THREADS"]), thread_name_prefix="room")
+    if os.environ.get("ROOM_THREADS") and socketio.async_mode == "threading" else None,
+    offload=blocking_io(),
+)
+SHARDS = GAME.shards
+ROOMS = GAME.rooms
 
-    print(f"[DEBUG] Join attempt: User='{username}' Room='{roomcode}'")  # LOG
 
-    # --- FIX FOR PHANTOM PLAYERS ---
-    # We explicitly check for None, empty string, 'null', or 'undefined'
-    if not username or username == 'null' or username == 'undefined':
-        print(f"[BLOCKING PHANTOM] Rejected connection with username: {username}")  # LOG
-        emit("error", {"msg": "Username required to join."})
-        return
-    # -----------------------------
+# ---------------- ROUTES ---------------- #
 
-    if roomcode not in ROOMS:
-        emit("error", {"msg": "Room not found"})
-        return
+def send_asset(asset):
+    """Responds with a prepared Asset (gzipped and/or 304 as the request allows)."""
+    status, body, headers = asset.respond(request.headers.get("Accept-Encoding", ""),
+                                          request.headers.get("If-None-Match", ""))
+    return Response(body, status=status, headers=headers)
 
-    room = ROOMS[roomcode]
-    player = room.add_player(username)
-    player.sid = request.sid
 
-    join_room(roomcode)
-    # Broadcast new state to everyone in the room so they see the new player
-    emit("state_update", room.get_public_state(), to=roomcode)
+@app.route("/")
+def index():
+    """Renders the Home/Lobby page (once; later requests get the cached copy)."""
+    return send_asset(ASSETS.page("index", lambda: render_template("index.html")))
 
 
-@socketio.on("start_game")
-def handle_start(data):
-    """
-    Starts the game (moves from LOBBY to SELECTION phase).
-    Only the room creator (host) is allowed to trigger this.
-    """
-    roomcode = data.get("roomcode")
-    username = data.get("username")
-
-    if roomcode in ROOMS:
-        room = ROOMS[roomcode]
+@app.route("/rules")
+def rules():
+    """Renders the Rules page."""
+    return send_asset(ASSETS.page("rules", lambda: render_template("rules.html")))
 
-        if room.creator != username:
-            emit("error", {"msg": "Only the host can start the game!"})
-            return
 
-        success, msg = room.start_selection_phase()
-        if success:
-            emit("state_update", room.get_public_state(), to=roomcode)
-            for p in room.players:
-                if p.sid:
-                    socketio.emit("deal_hand", p.initial_cards, room=p.sid)
-        else:
-            emit("error", {"msg": msg})
+@app.route("/static/<path:filename>")
+def static_file(filename):
+    """Files from static/, by hashed name (cached for good) or plain name (revalidated)."""
+    asset = ASSETS.get(filename)
+    if asset is None:
+        return Response("Not Found", status=404, mimetype="text/plain")
+    return send_asset(asset)
 
 
-@socketio.on("submit_cards")
-def handle_submit(data):
+@app.route("/game/<roomcode>")
+def game_ui(roomcode):
     """
-    Receives the 5 chosen cards from a player.
+    Renders the main Game Interface.
+    Rooms owned by another worker are redirected there, so the page's socket
+    connects to the process holding the game.
+    Checks if the room exists; if not, redirects back to Home.
     """
-    roomcode = data.get("roomcode")
-    username = data.get("username")
-    indices = data.get("indices")
-
-    if roomcode in ROOMS:
-        room = ROOMS[roomcode]
-        room.submit_selection(username, indices)
-        emit("state_update", room.get_public_state(), to=roomcode)
+    if not SHARDS.owns(roomcode):
+        owner_url = SHARDS.owner_url(roomcode)
+        if owner_url:
+            return redirect(owner_url + request.full_path.rstrip("?"))
+        return redirect(url_for('index'))
+    if roomcode not in ROOMS:
+        return redirect(url_for('index'))
+    # The same page for every room: game.js reads the code from the URL
+    return send_asset(ASSETS.page("game", lambda: render_template(
+        "game.html", wire_version=wire.WIRE_VERSION, wire_keys=wire.KEYS)))
 
 
-@socketio.on("select_giver")
-def handle_select_giver(data):
+@app.route("/search")
+def search():
     """
-    Captain selects which teammate will give the clues.
+    Ranked fuzzy card search, ignoring case and accents: /search?q=coracao&limit=10.
+    With &room=ABCD it covers that room's packs and flags the cards it excludes.
     """
-    roomcode = data.get("roomcode")
-    target_user = data.get("target_user")
-    if roomcode in ROOMS:
-        ROOMS[roomcode].set_clue_giver(target_user)
-        emit("state_update", ROOMS[roomcode].get_public_state(), to=roomcode)
+    return jsonify(GAME.search(request.args))
 
 
-@socketio.on("action_guess")
-def handle_guess(data):
-    """
-    The Clue Giver confirms their team guessed correctly.
-    """
-    roomcode = data.get("roomcode")
-    if roomcode in ROOMS:
-        ROOMS[roomcode].guess_correct()
-        emit("state_update", ROOMS[roomcode].get_public_state(), to=roomcode)
+@app.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
 
 
-@socketio.on("action_skip")
-def handle_skip(data):
-    """
-    The Clue Giver skips the current card (only allowed in R2/R3).
-    """
-    roomcode = data.get("roomcode")
-    if roomcode in ROOMS:
-        ROOMS[roomcode].skip_card()
-        emit("state_update", ROOMS[roomcode].get_public_state(), to=roomcode)
+# ---------------- BACKGROUND TASKS ---------------- #
 
+def start_background_tasks():
+    """Starts the background tasks on first use (turn expiry, sweeps, coalesced broadcasts, journal, card stats)."""
+    if not GAME.turn_timers.running:
+        GAME.turn_timers.start(socketio.start_background_task, socketio.sleep)
+        GAME.sweep_rooms()
+    if GAME.broadcasts.window > 0:
+        GAME.broadcasts.start(socketio.start_background_task, socketio.sleep)
+    GAME.spectators.start(socketio.start_background_task, socketio.sleep)
+    if GAME.journal:
+        GAME.journal.start(socketio.start_background_task, socketio.sleep)
+    if GAME.card_stats:
+        GAME.card_stats.start(socketio.start_background_task, socketio.sleep)
 
-@socketio.on("action_taboo")
-def handle_taboo(data):
-    """
-    The Clue Giver marks the current clue as illegal/taboo.
-    Burns the card and gives a point to the opposing team.
-    """
-    roomcode = data.get("roomcode")
-    if roomcode in ROOMS:
-        ROOMS[roomcode].taboo_guess()
-        emit("state_update", ROOMS[roomcode].get_public_state(), to=roomcode)
 
+# ---------------- SOCKET.IO EVENTS ---------------- #
+# The handlers live in game/server.py and take the sid first (as on the ASGI server)
 
-@socketio.on("end_turn")
-def handle_end_turn(data):
-    """
-    Manually ends the turn (or triggered by timer).
-    """
-    roomcode = data.get("roomcode")
-    if roomcode in ROOMS:
-        ROOMS[roomcode].end_turn()
-        emit("state_update", ROOMS[roomcode].get_public_state(), to=roomcode)
+def register(event, handler):
+    """socketio.on(event) for a GameServer handler."""
+    socketio.on(event)(lambda *args: handler(request.sid, *args))
 
 
-@socketio.on("disconnect")
-def handle_disconnect():
-    """
-    Handles player disconnection.
-    """
-    pass
+for event, handler in GAME.handlers().items():
+    register(event, handler)
+GAME.on_create = lambda room: start_background_tasks()
+# Decks for new pack combinations are built on this loop, so create_room needs it from the start
+GAME.packs.start(socketio.start_background_task, socketio.sleep)
 
+if GAME.journal:
+    GAME.recover()
+    start_background_tasks()
 
 if __name__ == "__main__":
-    socketio.run(app, debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
+    socketio.run(app, host=os.environ.get("HOST", "127.0.0.1"), port=int(os.environ.get("PORT", 5000)),
+                 debug=os.environ.get("FLASK_DEBUG", "1") == "1", allow_unsafe_werkzeug=True)
@@ -0,0 +1,200 @@
+# Clue & Cue
+# asgi_app.py
+"""
+Asyncio entry point: the same pages, Socket.IO events and room semantics as
+app.py, served by python-socketio's ASGI server (no Flask, no eventlet).
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+
+The rooms and every handler are game/server.py's GameServer, exactly as in
+app.py. Handlers and room commands are synchronous and run on the event
+loop, so a room's mailbox never has two commands in flight; only the sends
+are asynchronous (see AsyncTransport). Journal, card stats and deck pack
+files are handled from threads.
+"""
+# ---------------- IMPORTS ---------------- #
+from game.assets import AssetPipeline
+from game.metrics import Metrics
+from game.server import GameServer
+from game import wire
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+import asyncio
+import json
+import os
+import socketio
+import threading
+from urllib.parse import parse_qs
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# ---------------- SERVER CONFIG ---------------- #
+# Per-event counts, latencies and payload sizes, served on /metrics
+METRICS = Metrics()
+
+# Multi-process mode shares broadcasts through Redis (e.g. 'redis://localhost:6379/0')
+MESSAGE_QUEUE = os.environ.get("SOCKETIO_MESSAGE_QUEUE")
+sio = socketio.AsyncServer(
+    async_mode="asgi",
+    client_manager=socketio.AsyncRedisManager(MESSAGE_QUEUE) if MESSAGE_QUEUE else None,
+    json=METRICS.json_module(),
+)
+
+
+class AsyncTransport:
+    """
+    How the GameServer reaches clients here. Its calls are synchronous, so
+    each send becomes a task. Tasks start in the order they were created, and
+    python-socketio picks the recipients and queues the packets in that first
+    step, so every client still gets its messages in the order they were sent.
+    """
+
+    def emit(self, event, data, to, skip_sid=None):
+        asyncio.ensure_future(sio.emit(event, data, to=to, skip_sid=skip_sid))
+
+    def fan_out(self, event, data, to):
+        asyncio.ensure_future(sio.emit(event, data, to=to))
+
+    def enter_room(self, sid, name):
+        asyncio.ensure_future(sio.enter_room(sid, name))
+
+    def close_room(self, name):
+        asyncio.ensure_future(sio.close_room(name))
+
+
+# Same rooms, handlers, settings (and environment variables) as app.py
+GAME = GameServer(AsyncTransport(), METRICS)
+SHARDS = GAME.shards
+ROOMS = GAME.rooms
+
+# Templates are rendered with Jinja directly; url_for only needs the few endpoints they use
+TEMPLATES = Environment(loader=FileSystemLoader(os.path.join(ROOT, "templates")),
+                        autoescape=select_autoescape(["html"]))
+ENDPOINTS = {"index": "/", "rules": "/rules"}
+ASSETS = AssetPipeline(os.path.join(ROOT, "static"))  # Same hashed, pre-gzipped files and page cache as app.py
+
+
+def url_for(endpoint, **values):
+    if endpoint == "static":
+        return ASSETS.url(values["filename"])
+    return ENDPOINTS[endpoint]
+
+
+TEMPLATES.globals["url_for"] = url_for
+TEMPLATES.globals["asset_url"] = ASSETS.url
+
+
+# ---------------- ROUTES ---------------- #
+
+async def respond(send, status, body=b"", content_type="text/html; charset=utf-8", headers=()):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", content_type.encode()), *headers]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_asset(scope, send, asset):
+    """Sends a prepared Asset (gzipped and/or 304 as the request headers allow)."""
+    request_headers = dict(scope.get("headers", ()))
+    status, body, headers = asset.respond(request_headers.get(b"accept-encoding", b"").decode("latin-1"),
+                                          request_headers.get(b"if-none-match", b"").decode("latin-1"))
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(k.lower().encode(), v.encode()) for k, v in headers]
+                + [(b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def redirect(send, location):
+    await respond(send, 302, headers=[(b"location", location.encode("utf-8"))])
+
+
+async def http_app(scope, receive, send):
+    """Everything that isn't Socket.IO: the pages, /static and /metrics."""
+    if scope["type"] != "http":
+        return
+    path = scope["path"]
+
+    if path == "/":
+        await send_asset(scope, send, ASSETS.page("index", TEMPLATES.get_template("index.html").render))
+    elif path == "/rules":
+        await send_asset(scope, send, ASSETS.page("rules", TEMPLATES.get_template("rules.html").render))
+    elif path.startswith("/static/"):
+        asset = ASSETS.get(path[len("/static/"):])
+        if asset is None:
+            await respond(send, 404, "Not Found", "text/plain")
+        else:
+            await send_asset(scope, send, asset)
+    elif path.startswith("/game/"):
+        # Rooms owned by another worker are redirected there (see app.game_ui)
+        roomcode = path[len("/game/"):]
+        if not SHARDS.owns(roomcode):
+            owner_url = SHARDS.owner_url(roomcode)
+            query = scope.get("query_string", b"").decode()
+            await redirect(send, owner_url + path + ("?" + query if query else "") if owner_url else "/")
+        elif roomcode not in ROOMS:
+            await redirect(send, "/")
+        else:
+            render = TEMPLATES.get_template("game.html").render
+            await send_asset(scope, send, ASSETS.page(
+                "game", lambda: render(wire_version=wire.WIRE_VERSION, wire_keys=wire.KEYS)))
+    elif path == "/search":
+        # Same parameters and answer as app.search
+        args = {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode()).items()}
+        await respond(send, 200, json.dumps(GAME.search(args)), "application/json")
+    elif path == "/metrics":
+        await respond(send, 200, METRICS.render(), "text/plain; version=0.0.4")
+    else:
+        await respond(send, 404, "Not Found", "text/plain")
+
+
+# ---------------- BACKGROUND TASKS ---------------- #
+
+def spawn_thread(target, *args):
+    """For the loops that touch files (journal, card stats, deck packs)."""
+    threading.Thread(target=target, args=args, daemon=True).start()
+
+
+async def startup():
+    """Recovers journaled rooms and starts the background tasks (ASGI lifespan startup)."""
+    if GAME.journal:
+        GAME.recover()
+        GAME.journal.start(spawn_thread)
+    if GAME.card_stats:
+        GAME.card_stats.start(spawn_thread)
+    GAME.packs.start(spawn_thread)
+
+    # Timers and coalescers only queue room commands, so they run as tasks on the loop
+    sio.start_background_task(GAME.turn_timers.run_async)
+    if GAME.broadcasts.window > 0:
+        sio.start_background_task(GAME.broadcasts.run_async)
+    sio.start_background_task(GAME.spectators.run_async)
+    GAME.sweep_rooms()
+
+
+async def shutdown():
+    GAME.turn_timers.running = False
+    GAME.broadcasts.running = False
+    GAME.spectators.running = False
+    if GAME.journal:
+        GAME.journal.running = False
+        GAME.journal.flush()
+    if GAME.card_stats:
+        GAME.card_stats.running = False
+        GAME.card_stats.flush()
+    GAME.packs.running = False
+
+
+# ---------------- SOCKET.IO EVENTS ---------------- #
+# The handlers live in game/server.py; python-socketio already passes the sid first
+
+for event, handler in GAME.handlers().items():
+    sio.on(event)(handler)
+
+
+# ---------------- ASGI APP ---------------- #
+app = socketio.ASGIApp(
+    sio,
+    other_asgi_app=http_app,
+    on_startup=startup,
+    on_shutdown=shutdown,
+)
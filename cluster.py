@@ -0,0 +1,113 @@
+# Clue & Cue
+# cluster.py
+"""
+Runs Clue & Cue in multi-process mode on a single machine.
+
+Starts one server process per worker on consecutive ports. Each worker owns
+its share of room codes (see game/sharding.py) and redirects players to the
+owner of a room, so all sockets of a game end up on the same process.
+Broadcasts are shared through Flask-SocketIO's message queue.
+
+    python cluster.py --workers 4 --broker zmq      # built-in local zmq broker (needs pyzmq)
+    python cluster.py --workers 4 --message-queue redis://localhost:6379/0
+"""
+# ---------------- IMPORTS ---------------- #
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+# ---------------- LOCAL BROKER ---------------- #
+
+def run_zmq_broker(pull_port, pub_port):
+    """
+    Minimal stand-in broker for the zmq message queue:
+    forwards everything pushed by the workers to every subscribed worker.
+    """
+    import zmq
+
+    context = zmq.Context()
+    receiver = context.socket(zmq.PULL)
+    receiver.bind(f"tcp://127.0.0.1:{pull_port}")
+    publisher = context.socket(zmq.PUB)
+    publisher.bind(f"tcp://127.0.0.1:{pub_port}")
+    while True:
+        publisher.send(receiver.recv())
+
+
+# ---------------- WORKERS ---------------- #
+
+def worker_command(host, port, use_gunicorn):
+    """Command line for a single worker process."""
+    if use_gunicorn:
+        return ["gunicorn", "-k", "eventlet", "-w", "1", "-b", f"{host}:{port}", "app:app"]
+    return [sys.executable, os.path.join(ROOT, "app.py")]
+
+
+def start_workers(args, message_queue):
+    """Starts every worker with its slice of the room codes and the shared layout."""
+    urls = [f"http://{args.public_host}:{args.port + i}" for i in range(args.workers)]
+    processes = []
+    for i in range(args.workers):
+        env = dict(os.environ)
+        env.update({
+            "CLUE_WORKERS": str(args.workers),
+            "CLUE_WORKER_INDEX": str(i),
+            "CLUE_WORKER_URLS": ",".join(urls),
+            "HOST": args.host,
+            "PORT": str(args.port + i),
+            "FLASK_DEBUG": "0",
+        })
+        if message_queue:
+            env["SOCKETIO_MESSAGE_QUEUE"] = message_queue
+        processes.append(subprocess.Popen(worker_command(args.host, args.port + i, args.gunicorn), cwd=ROOT, env=env))
+        print(f"[CLUSTER] Worker {i} on {urls[i]}")  # LOG
+    return processes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several Clue & Cue workers with room-affinity routing.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--port", type=int, default=5000, help="Port of worker 0; the others follow")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface the workers listen on")
+    parser.add_argument("--public-host", default="127.0.0.1", help="Host name browsers use to reach the workers")
+    parser.add_argument("--message-queue", help="Broker URL shared by the workers (e.g. redis://localhost:6379/0)")
+    parser.add_argument("--broker", choices=["zmq"], help="Start a local stand-in broker instead of using --message-queue")
+    parser.add_argument("--broker-ports", default="5555+5556", help="PULL+PUB ports of the local zmq broker")
+    parser.add_argument("--gunicorn", action="store_true", help="Run each worker under gunicorn + eventlet")
+    args = parser.parse_args(argv)
+
+    broker = None
+    message_queue = args.message_queue
+    if args.broker == "zmq":
+        pull_port, pub_port = (int(p) for p in args.broker_ports.split("+"))
+        broker = multiprocessing.Process(target=run_zmq_broker, args=(pull_port, pub_port), daemon=True)
+        broker.start()
+        message_queue = f"zmq+tcp://127.0.0.1:{pull_port}+{pub_port}"
+        print(f"[CLUSTER] Local broker on {message_queue}")  # LOG
+
+    if args.workers > 1 and not message_queue:
+        print("[CLUSTER] No message queue: cross-worker broadcasts are disabled")  # LOG
+
+    processes = start_workers(args, message_queue)
+    try:
+        while all(p.poll() is None for p in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.wait()
+        if broker:
+            broker.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# Clue & Cue
+# analytics.py
+# ---------------- IMPORTS ---------------- #
+from array import array
+from bisect import bisect_left
+from collections import deque
+import json
+import os
+import threading
+import time
+
+from .background import BackgroundLoop
+
+# ---------------- SETTINGS ---------------- #
+# What happened to a card while it was in play (index into the counts)
+GUESSED, SKIPPED, BURNED, TIMEOUT = range(4)
+OUTCOMES = ("guessed", "skipped", "burned", "timeout")
+ROUNDS = 3
+
+# Time-in-play histogram bounds, in seconds (last bucket is everything above)
+SECONDS_BUCKETS = (0.5, 1, 1.5, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 25, 30, 45, 60)
+
+# Difficulty is the share of outcomes that were not 'guessed', smoothed
+# towards the average of all cards as if every card had PRIOR_WEIGHT more.
+PRIOR_WEIGHT = 5
+
+DRAIN_SECONDS = 1  # How often the queue is folded in (files are written every 'interval')
+
+
+# ---------------- CARD STATS CLASS ---------------- #
+class CardStats(BackgroundLoop):
+    """
+    Per-card outcome counts and time-in-play histograms, per round.
+
+    Rooms only append (outcome, card id, round, seconds) to a bounded queue
+    (record); a background loop folds the queue into fixed-size arrays every
+    DRAIN_SECONDS, so memory doesn't grow with traffic and the action
+    handlers never wait.
+    Every 'interval' seconds it recomputes 'difficulty' (0 easy .. 1 hard,
+    indexed by card id) and writes everything to 'path' as JSON.
+    """
+
+    def __init__(self, catalog, path=None, interval=60, max_pending=100000):
+        self.catalog = catalog
+        self.path = path
+        self.interval = interval
+        self.pending = deque(maxlen=max_pending)  # Oldest events are dropped if the loop falls behind
+        size = len(catalog)
+        self.counts = array("I", bytes(4 * size * ROUNDS * len(OUTCOMES)))  # [card][round][outcome]
+        self.seconds = array("I", bytes(4 * size * ROUNDS * (len(SECONDS_BUCKETS) + 1)))  # [card][round][bucket]
+        self.difficulty = array("f", [0.5]) * size
+        self.lock = threading.Lock()
+        self.running = False
+        self.last_flush = time.time()
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @classmethod
+    def from_env(cls, catalog):
+        """CardStats saved to CARD_STATS_FILE every CARD_STATS_FLUSH_SECONDS (None if unset)."""
+        if not os.environ.get("CARD_STATS_FILE"):
+            return None
+        return cls(catalog, path=os.environ["CARD_STATS_FILE"],
+                   interval=int(os.environ.get("CARD_STATS_FLUSH_SECONDS", 60)))
+
+    # --- recording (request path) ---
+
+    def record(self, outcome, card_id, round_number, seconds):
+        """Queues one outcome; deque.append is atomic, so no lock is taken."""
+        self.pending.append((outcome, card_id, round_number, seconds))
+
+    # --- aggregation (background) ---
+
+    def drain(self):
+        """Folds queued outcomes into the counts. Returns how many were folded."""
+        folded = 0
+        buckets = len(SECONDS_BUCKETS) + 1
+        with self.lock:
+            while self.pending:
+                outcome, card_id, round_number, seconds = self.pending.popleft()
+                row = card_id * ROUNDS + round_number - 1
+                self.counts[row * len(OUTCOMES) + outcome] += 1
+                self.seconds[row * buckets + bisect_left(SECONDS_BUCKETS, seconds)] += 1
+                folded += 1
+        return folded
+
+    def update_difficulty(self):
+        """Recomputes the smoothed miss rate of every card."""
+        width = ROUNDS * len(OUTCOMES)
+        with self.lock:
+            counts = self.counts
+            guessed = [sum(counts[c * width + r * len(OUTCOMES) + GUESSED] for r in range(ROUNDS))
+                       for c in range(len(self.difficulty))]
+            totals = [sum(counts[c * width:(c + 1) * width]) for c in range(len(self.difficulty))]
+        everything = sum(totals)
+        average = 1 - sum(guessed) / everything if everything else 0.5
+        prior = PRIOR_WEIGHT * average
+        for card_id, (hits, total) in enumerate(zip(guessed, totals)):
+            self.difficulty[card_id] = (total - hits + prior) / (total + PRIOR_WEIGHT)
+
+    def quantile(self, card_id, round_number, q):
+        """Approximate time-in-play quantile (seconds), interpolated inside a histogram bucket."""
+        buckets = len(SECONDS_BUCKETS) + 1
+        start = (card_id * ROUNDS + round_number - 1) * buckets
+        row = self.seconds[start:start + buckets]
+        total = sum(row)
+        if not total:
+            return None
+        target = q * total
+        seen = 0
+        for i, count in enumerate(row):
+            if count and seen + count >= target:
+                low = SECONDS_BUCKETS[i - 1] if i else 0.0
+                high = SECONDS_BUCKETS[i] if i < len(SECONDS_BUCKETS) else low
+                return round(low + (high - low) * (target - seen) / count, 3)
+            seen += count
+        return SECONDS_BUCKETS[-1]
+
+    # --- files ---
+
+    def to_dict(self):
+        """Every card with at least one outcome, keyed by 'type/name' (stable across catalog rebuilds)."""
+        buckets = len(SECONDS_BUCKETS) + 1
+        cards = {}
+        for card_id in range(len(self.difficulty)):
+            row = card_id * ROUNDS
+            counts = self.counts[row * len(OUTCOMES):(row + ROUNDS) * len(OUTCOMES)]
+            if not any(counts):
+                continue
+            entry = {name: [counts[r * len(OUTCOMES) + o] for r in range(ROUNDS)] for o, name in enumerate(OUTCOMES)}
+            entry["seconds"] = [list(self.seconds[(row + r) * buckets:(row + r + 1) * buckets]) for r in range(ROUNDS)]
+            entry["p50_seconds"] = [self.quantile(card_id, r + 1, 0.5) for r in range(ROUNDS)]
+            entry["p90_seconds"] = [self.quantile(card_id, r + 1, 0.9) for r in range(ROUNDS)]
+            entry["difficulty"] = round(self.difficulty[card_id], 4)
+            cards[f"{self.catalog.type_name(card_id)}/{self.catalog.name(card_id)}"] = entry
+        return {"seconds_buckets": SECONDS_BUCKETS, "updated": time.time(), "cards": cards}
+
+    def save(self, path=None):
+        """Writes to_dict() atomically."""
+        path = path or self.path
+        data = self.to_dict()
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+
+    def load(self, path):
+        """Adds the counts saved in a previous run (cards no longer in the catalog are ignored)."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if tuple(data.get("seconds_buckets", ())) != SECONDS_BUCKETS:
+            return
+        ids = {f"{self.catalog.type_name(c)}/{self.catalog.name(c)}": c for c in range(len(self.difficulty))}
+        buckets = len(SECONDS_BUCKETS) + 1
+        with self.lock:
+            for key, entry in data["cards"].items():
+                card_id = ids.get(key)
+                if card_id is None:
+                    continue
+                row = card_id * ROUNDS
+                for o, name in enumerate(OUTCOMES):
+                    for r, count in enumerate(entry[name]):
+                        self.counts[(row + r) * len(OUTCOMES) + o] += count
+                for r, counts in enumerate(entry["seconds"]):
+                    for b, count in enumerate(counts):
+                        self.seconds[(row + r) * buckets + b] += count
+        self.update_difficulty()
+
+    # --- background loop (see game/background.py) ---
+
+    def flush(self):
+        """Folds the queue in, recomputes difficulty and saves."""
+        self.drain()
+        self.update_difficulty()
+        if self.path:
+            self.save()
+
+    LOOP_NAME = "ANALYTICS"
+
+    def period(self):
+        return DRAIN_SECONDS
+
+    def step(self):
+        """Folds the queue in; every 'interval' seconds also flushes."""
+        self.drain()
+        if time.time() - self.last_flush >= self.interval:
+            self.last_flush = time.time()
+            self.flush()
@@ -0,0 +1,135 @@
+# Clue & Cue
+# assets.py
+# ---------------- IMPORTS ---------------- #
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+# ---------------- SETTINGS ---------------- #
+HASH_LENGTH = 12  # Hex digits of the content hash in served names (style.3f2a9c1b04de.css)
+IMMUTABLE = "public, max-age=31536000, immutable"  # Hashed names never change content
+REVALIDATE = "no-cache"  # Pages and plain names: cached, but checked against the ETag
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_GZIP_BYTES = 256  # Smaller bodies aren't worth a Content-Encoding
+
+
+# ---------------- ASSET CLASS ---------------- #
+class Asset:
+    """
+    One response body, prepared once: the raw bytes, a gzipped copy (for text
+    types, when it is smaller) and an ETag for each of them.
+    """
+
+    __slots__ = ("body", "gzipped", "etag", "gzip_etag", "content_type", "cache_control")
+
+    def __init__(self, body, content_type, cache_control=REVALIDATE):
+        self.body = body
+        self.content_type = content_type
+        self.cache_control = cache_control
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'  # A different representation needs its own strong ETag
+        self.gzipped = None
+        if content_type.startswith(COMPRESSIBLE) and len(body) >= MIN_GZIP_BYTES:
+            gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gzipped) < len(body):
+                self.gzipped = gzipped
+
+    def respond(self, accept_encoding="", if_none_match=""):
+        """(status, body, headers) for a request with these Accept-Encoding / If-None-Match headers."""
+        use_gzip = self.gzipped is not None and "gzip" in (accept_encoding or "")
+        etag = self.gzip_etag if use_gzip else self.etag
+        headers = [("Content-Type", self.content_type), ("Cache-Control", self.cache_control), ("ETag", etag)]
+        if self.gzipped is not None:
+            headers.append(("Vary", "Accept-Encoding"))
+        if if_none_match and (if_none_match.strip() == "*" or etag in if_none_match):
+            return 304, b"", headers
+        if use_gzip:
+            headers.append(("Content-Encoding", "gzip"))
+            return 200, self.gzipped, headers
+        return 200, self.body, headers
+
+
+# ---------------- ASSET PIPELINE CLASS ---------------- #
+class AssetPipeline:
+    """
+    The files in 'directory' (static/), read and gzipped once at startup.
+
+    Each file is served under a content-hashed name (style.<hash>.css) with an
+    immutable Cache-Control, so browsers never ask for it again until a deploy
+    changes the content (and so the name). The plain name still works, with
+    ETag revalidation. Templates link the hashed names through url().
+
+    Rendered pages are cached the same way (page()): a route's HTML is rendered
+    the first time it is asked for and served from memory after that, so a
+    whole party loading the game page at once costs a dict lookup each.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.assets = {}  # Served name (hashed and plain) -> Asset
+        self.urls = {}  # Plain name -> '/static/<hashed name>'
+        self.pages = {}  # Route key -> Asset
+        self.lock = threading.Lock()
+        self.build()
+
+    def build(self):
+        """(Re)reads every file; cached pages are dropped, since they link the old names."""
+        assets, urls = {}, {}
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    body = f.read()
+
+                content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                if content_type.startswith(COMPRESSIBLE):
+                    content_type += "; charset=utf-8"
+                stem, ext = os.path.splitext(name)
+                hashed = f"{stem}.{hashlib.sha256(body).hexdigest()[:HASH_LENGTH]}{ext}"
+
+                asset = Asset(body, content_type, IMMUTABLE)
+                assets[hashed] = asset
+                assets[name] = _with_cache_control(asset, REVALIDATE)
+                urls[name] = "/static/" + hashed
+
+        with self.lock:
+            self.assets, self.urls = assets, urls
+            self.pages = {}
+
+    def url(self, filename):
+        """The hashed URL of a static file (for templates: {{ asset_url('style.css') }})."""
+        return self.urls.get(filename) or "/static/" + filename
+
+    def get(self, name):
+        """The Asset served as /static/<name>, or None."""
+        return self.assets.get(name)
+
+    def page(self, key, render):
+        """The cached page for 'key'; render() (returning the HTML text) runs only the first time."""
+        asset = self.pages.get(key)
+        if asset is None:
+            asset = Asset(render().encode("utf-8"), "text/html; charset=utf-8")
+            with self.lock:
+                self.pages[key] = asset
+        return asset
+
+    def stats(self):
+        return {
+            "files": len(self.urls),
+            "bytes": sum(len(self.assets[name].body) for name in self.urls),
+            "gzipped_bytes": sum(len(self.assets[name].gzipped or self.assets[name].body) for name in self.urls),
+            "pages": len(self.pages),
+        }
+
+
+def _with_cache_control(asset, cache_control):
+    """A copy of an Asset sharing its bodies, with another Cache-Control."""
+    copy = Asset.__new__(Asset)
+    for slot in Asset.__slots__:
+        setattr(copy, slot, getattr(asset, slot))
+    copy.cache_control = cache_control
+    return copy
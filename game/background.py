@@ -0,0 +1,58 @@
+# Clue & Cue
+# background.py
+# ---------------- IMPORTS ---------------- #
+import asyncio
+import time
+
+
+def run_here(function, *args):
+    """The default 'offload' of the loops: just calls the function."""
+    return function(*args)
+
+
+# ---------------- BACKGROUND LOOP CLASS ---------------- #
+class BackgroundLoop:
+    """
+    Base of the server's periodic tasks (turn timers, broadcasts, journal,
+    card stats, deck packs): one loop, started at most once, that calls
+    step() every period() seconds until 'running' is cleared.
+    Subclasses define step() and period() and set self.lock and self.running.
+    """
+
+    LOOP_NAME = "BACKGROUND"  # Prefix of the log line when step() raises
+
+    def period(self):
+        """Seconds between steps; 0 disables the loop."""
+        raise NotImplementedError
+
+    def step(self):
+        """One round of the loop's work."""
+        raise NotImplementedError
+
+    def start(self, spawn, sleep=time.sleep):
+        """Starts the loop once, e.g. start(socketio.start_background_task, socketio.sleep)."""
+        with self.lock:
+            if self.running or not self.period():
+                return
+            self.running = True
+        spawn(self.run, sleep)
+
+    def run(self, sleep=time.sleep):
+        """The loop itself; pass socketio.sleep so it yields to the hub."""
+        self.running = True
+        while self.running:
+            sleep(self.period())
+            self.run_step()
+
+    async def run_async(self):
+        """The same loop as an asyncio task (asgi_app.py)."""
+        self.running = True
+        while self.running:
+            await asyncio.sleep(self.period())
+            self.run_step()
+
+    def run_step(self):
+        try:
+            self.step()
+        except Exception as e:
+            print(f"[{self.LOOP_NAME} ERROR] {e}")  # LOG
@@ -0,0 +1,55 @@
+# Clue & Cue
+# broadcast.py
+# ---------------- IMPORTS ---------------- #
+import threading
+
+from .background import BackgroundLoop
+
+
+# ---------------- COALESCER CLASS ---------------- #
+class BroadcastCoalescer(BackgroundLoop):
+    """
+    Merges bursts of state changes into one broadcast per room per frame.
+    Rooms are marked dirty as events come in; a single background loop calls
+    flush(roomcode) for every dirty room once per 'window' seconds.
+    Because patches carry every field changed since the last one, ten quick
+    taps on "Got it!" become one patch.
+    """
+
+    def __init__(self, flush, window=0.04):
+        self.flush = flush
+        self.window = window
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.running = False
+
+    def mark(self, roomcode):
+        """Schedules the room for the next flush."""
+        with self.lock:
+            self.pending.add(roomcode)
+
+    def discard(self, roomcode):
+        """Forgets a pending flush (the room was just flushed directly)."""
+        with self.lock:
+            self.pending.discard(roomcode)
+
+    def flush_pending(self):
+        """Flushes every marked room once. Returns how many were flushed."""
+        with self.lock:
+            rooms, self.pending = self.pending, set()
+        for roomcode in rooms:
+            try:
+                self.flush(roomcode)
+            except Exception as e:
+                print(f"[BROADCAST ERROR] {roomcode}: {e}")  # LOG
+        return len(rooms)
+
+    # --- background loop (see game/background.py) ---
+
+    LOOP_NAME = "BROADCAST"
+
+    def period(self):
+        return self.window
+
+    def step(self):
+        self.flush_pending()
@@ -0,0 +1,144 @@
+# Clue & Cue
+# catalog.py
+# ---------------- IMPORTS ---------------- #
+from array import array
+import mmap
+import os
+import struct
+import sys
+import unicodedata
+
+# ---------------- FILE FORMAT ---------------- #
+# The card list in database.py is compiled once into a flat file that
+# every worker memory-maps, instead of each one building ~1,900 dicts:
+#
+#   header     magic, version, card count, types blob size, names blob size
+#   types      type names, '\n' separated (each stored once, referenced by id)
+#   offsets    uint32 x (cards + 1), start of each name in the names blob
+#   type_ids   uint16 x cards
+#   names      UTF-8 card names, back to back
+#
+# Numbers are stored in native byte order; the file is rebuilt whenever
+# database.py is newer than it, or with `python -m game.catalog`.
+MAGIC = b"CCAT"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHIII")
+
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_PATH = os.path.join(GAME_DIR, "database.py")
+CATALOG_PATH = os.path.join(GAME_DIR, "cards.cat")
+
+
+def _pad(size):
+    """Bytes needed to align a section to 4 bytes."""
+    return -size % 4
+
+
+def normalize(text):
+    """Casefolds, strips accents and collapses spaces ('Laços  de Família' -> 'lacos de familia')."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return " ".join("".join(ch for ch in decomposed if not unicodedata.combining(ch)).split())
+
+
+# ---------------- CATALOG CLASS ---------------- #
+class Catalog:
+    """
+    Read-only card catalog. Cards are plain integer ids (0 .. len - 1);
+    names are decoded from the mapped file only when a card is sent to a client.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+
+        magic, version, _, count, types_size, names_size = HEADER.unpack_from(view)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} card catalog")
+
+        pos = HEADER.size
+        types_blob = bytes(view[pos:pos + types_size]).decode("utf-8")
+        self.types = tuple(sys.intern(t) for t in types_blob.split("\n")) if types_blob else ()
+        pos += types_size + _pad(types_size)
+
+        self.offsets = view[pos:pos + 4 * (count + 1)].cast("I")
+        pos += 4 * (count + 1)
+        self.type_ids = view[pos:pos + 2 * count].cast("H")
+        pos += 2 * count
+        self.names = view[pos:pos + names_size]
+
+    def __len__(self):
+        return len(self.type_ids)
+
+    def name(self, card_id):
+        return str(self.names[self.offsets[card_id]:self.offsets[card_id + 1]], "utf-8")
+
+    def type_id(self, card_id):
+        return self.type_ids[card_id]
+
+    def type_name(self, card_id):
+        return self.types[self.type_ids[card_id]]
+
+    def card(self, card_id):
+        """The card as the clients know it: {'name': ..., 'type': ...}."""
+        return {"name": self.name(card_id), "type": self.type_name(card_id)}
+
+
+# ---------------- BUILDING ---------------- #
+
+def compile_catalog(cards, path=CATALOG_PATH):
+    """Writes a list of {'name', 'type'} dicts as a catalog file (atomically)."""
+    types = []
+    type_index = {}
+    offsets = array("I", [0])
+    type_ids = array("H")
+    names = bytearray()
+
+    for card in cards:
+        type_name = card["type"]
+        if type_name not in type_index:
+            type_index[type_name] = len(types)
+            types.append(type_name)
+        type_ids.append(type_index[type_name])
+        names += card["name"].encode("utf-8")
+        offsets.append(len(names))
+
+    types_blob = "\n".join(types).encode("utf-8")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(type_ids), len(types_blob), len(names)))
+        f.write(types_blob + b"\0" * _pad(len(types_blob)))
+        f.write(offsets.tobytes())
+        f.write(type_ids.tobytes())
+        f.write(names)
+    os.replace(tmp_path, path)
+
+
+def is_stale(path=CATALOG_PATH, source=SOURCE_PATH):
+    """True if the catalog file is missing or older than database.py."""
+    if not os.path.exists(path):
+        return True
+    return os.path.getmtime(source) > os.path.getmtime(path)
+
+
+_catalog = None
+
+
+def get_catalog():
+    """
+    Returns the shared Catalog, compiling database.py first if needed.
+    database.py is only imported when the catalog file has to be rebuilt.
+    """
+    global _catalog
+    if _catalog is None:
+        if is_stale():
+            from .database import cards
+            compile_catalog(cards)
+        _catalog = Catalog()
+    return _catalog
+
+
+if __name__ == "__main__":
+    from .database import cards
+    compile_catalog(cards)
+    print(f"Compiled {len(cards)} cards into {CATALOG_PATH}")
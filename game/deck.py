@@ -0,0 +1,50 @@
+# Clue & Cue
+# deck.py
+# ---------------- IMPORTS ---------------- #
+from collections import deque
+
+
+# ---------------- DECK CLASS ---------------- #
+class Deck:
+    """
+    The cards left to play in one round.
+    All three rounds of a match share the same immutable card tuple;
+    each Deck only keeps its own order as a deque of indices into it,
+    so draw, skip and burn are all O(1).
+    """
+
+    __slots__ = ("cards", "order")
+
+    def __init__(self, cards=(), order=None):
+        self.cards = cards  # Shared tuple, never mutated
+        self.order = deque(range(len(cards)) if order is None else order)
+
+    def __len__(self):
+        return len(self.order)
+
+    def __bool__(self):
+        return bool(self.order)
+
+    def peek(self):
+        """Returns the card on top of the deck (or None if empty)."""
+        if not self.order:
+            return None
+        return self.cards[self.order[0]]
+
+    def draw(self):
+        """Removes and returns the top card (used when a card is guessed)."""
+        return self.cards[self.order.popleft()]
+
+    def burn(self):
+        """Removes the top card from play for this round (taboo)."""
+        return self.cards[self.order.popleft()]
+
+    def skip(self):
+        """Rotates the top card to the bottom of the deck."""
+        self.order.rotate(-1)
+
+    @classmethod
+    def for_match(cls, cards, rounds=3):
+        """Builds one Deck per round over a single shared copy of the cards."""
+        shared = tuple(cards)
+        return [cls(shared) for _ in range(rounds)]
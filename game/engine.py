@@ -1,10 +1,43 @@
 # Clue & Cue
 # engine.py
 # ---------------- IMPORTS ---------------- #
-from .database import cards
+from .analytics import GUESSED, SKIPPED, BURNED, TIMEOUT
+from .catalog import get_catalog
+from .deck import Deck
+from .packs import get_library
+from .sampler import Bitset, CardIndex, balance_hands, deal_hands, get_index
+import os
 import random
 import time
 
+# ---------------- GAME SETTINGS ---------------- #
+TURN_SECONDS = 30
+TURN_GRACE_SECONDS = 1  # Buffer for latency after the timer hits 0
+HAND_SIZE = 8  # Cards dealt to each player
+# Optional cap on cards of one type per hand, so one category can't fill a hand (off unless set)
+MAX_CARDS_PER_TYPE = int(os.environ["MAX_CARDS_PER_TYPE"]) if os.environ.get("MAX_CARDS_PER_TYPE") else None
+
+KEEP_SIZE = 5  # Cards each player puts in the match deck
+
+
+class Rules:
+    """The tunable settings above for one room (tools/simulate.py tries other values)."""
+
+    __slots__ = ("turn_seconds", "hand_size", "keep_size", "max_cards_per_type")
+
+    def __init__(self, turn_seconds=TURN_SECONDS, hand_size=HAND_SIZE, keep_size=KEEP_SIZE,
+                 max_cards_per_type=MAX_CARDS_PER_TYPE):
+        self.turn_seconds = turn_seconds
+        self.hand_size = hand_size
+        self.keep_size = keep_size
+        self.max_cards_per_type = max_cards_per_type
+
+
+DEFAULT_RULES = Rules()
+
+# Top-level public state fields that can be sent on their own in a patch
+STATE_FIELDS = ("state", "players", "scores", "round_info", "turn_deadline")
+
 
 # ---------------- PLAYER CLASS ---------------- #
 class Player:
@@ -13,19 +46,23 @@ class Player:
     Stores their hand, team assignment, and connection ID.
     """
 
-    def __init__(self, username):
+    __slots__ = ("user", "index", "team", "initial_cards", "selected_cards", "sid", "token")
+
+    def __init__(self, username, index=0):
         self.user = username
+        self.index = index  # Position in Room.players
         self.team = None  # Assigned as 1 or 2
-        self.initial_cards = []  # The 8 cards dealt at start
-        self.selected_cards = []  # The 5 cards chosen for the deck
+        self.initial_cards = []  # Ids of the cards dealt at start (Rules.hand_size)
+        self.selected_cards = []  # Ids of the cards chosen for the deck (Rules.keep_size)
         self.sid = None  # Socket ID for private communication
+        self.token = None  # Session token for resuming after a reconnect (set by the server)
 
     def to_dict(self):
         """Converts player object to a dictionary for JSON transmission."""
         return {
             "user": self.user,
             "team": self.team,
-            "has_selected": len(self.selected_cards) == 5
+            "has_selected": bool(self.selected_cards)  # Only ever set to a full selection
         }
 
 
@@ -36,19 +73,53 @@ class Room:
     Handles logic for turns, scoring, and card management.
     """
 
-    def __init__(self, roomcode, creator_username):
+    __slots__ = (
+        "roomcode", "creator", "catalog", "card_index", "seen_cards", "excluded_cards", "game_state",
+        "round_one_cards", "round_two_cards", "round_three_cards",
+        "players", "player_index", "teams", "ready_count", "_roster",
+        "team_one_score", "team_two_score",
+        "team_one_captain", "team_two_captain", "current_captain_chooser", "current_clue_giver",
+        "card_in_play", "card_shown_at", "turn_end_timestamp", "turn_id",
+        "version", "dirty",
+        "seed", "rng", "clock", "journal", "rules", "analytics", "packs", "pack_digests",
+    )
+
+    def __init__(self, roomcode, creator_username, catalog=None, seed=None, rules=None, packs=(),
+                 pack_digests=None):
         self.roomcode = roomcode
         self.creator = creator_username
+        self.rules = rules or DEFAULT_RULES
+
+        # Randomness and time come from the room, so a journal replay repeats them exactly
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.clock = time.time
+        self.journal = None  # Called as journal(roomcode, op, args) for every mutation (see game/journal.py)
+        self.analytics = None  # CardStats fed with card outcomes, and used to balance hands (see game/analytics.py)
+        self.packs = tuple(packs)  # Deck packs played on top of the base cards (see game/packs.py)
+        if self.packs:
+            # Shared with every room on the same packs; raises KeyError for an unknown pack
+            # (and ValueError if pack_digests, from the journal, no longer match)
+            self.catalog, self.card_index = get_library().deck(self.packs, pack_digests)
+        else:
+            self.catalog = catalog or get_catalog()  # Cards are passed around as ids into this
+            self.card_index = get_index() if catalog is None else CardIndex(catalog)
+        self.pack_digests = self.catalog.digests if self.packs else ()  # Journaled with the packs
+        self.seen_cards = Bitset(len(self.catalog))  # Dealt in earlier matches of this room
+        self.excluded_cards = set()  # Card ids the host never wants dealt (also kept in seen_cards)
         self.game_state = "LOBBY"  # Phases: LOBBY -> SELECTION -> ROUND_1 -> ROUND_2 -> ROUND_3 -> FINISHED
 
-        # Card Decks
-        self.round_one_cards = []
-        self.round_two_cards = []
-        self.round_three_cards = []
+        # Card Decks (one Deck per round, sharing a single tuple of card ids)
+        self.round_one_cards = Deck()
+        self.round_two_cards = Deck()
+        self.round_three_cards = Deck()
 
         # Player Data
         self.players = []
-        self.players_map = {}
+        self.player_index = {}  # Username -> position in self.players
+        self.teams = {1: [], 2: []}  # Team -> positions in self.players
+        self.ready_count = 0  # Players who submitted their cards
+        self._roster = None  # Cached public player list, rebuilt after _mark("players")
 
         # Scores
         self.team_one_score = 0
@@ -61,79 +132,165 @@ class Room:
         self.current_clue_giver = None  # The player currently giving clues
 
         # Turn State
-        self.card_in_play = None
+        self.card_in_play = None  # Card id (or None)
+        self.card_shown_at = 0  # When card_in_play was revealed (for analytics)
         self.turn_end_timestamp = 0
+        self.turn_id = 0  # Increases every turn, so stale end_turn calls can be ignored
+
+        # State Versioning (see get_state_patch)
+        self.version = 0
+        self.dirty = set()
 
         # Auto-add creator
         self.add_player(creator_username)
 
+    def __getstate__(self):
+        """
+        Pickled for journal snapshots. The catalog, index, clock, journal and
+        analytics belong to the running process and are re-attached on load.
+        """
+        skip = ("catalog", "card_index", "clock", "journal", "analytics")
+        return {name: getattr(self, name) for name in self.__slots__ if name not in skip}
+
+    def __setstate__(self, state):
+        self.packs = ()
+        self.pack_digests = None  # Snapshots from before digests were saved aren't checked
+        self.excluded_cards = set()
+        for name, value in state.items():
+            setattr(self, name, value)
+        if self.packs:
+            try:
+                self.catalog, self.card_index = get_library().deck(self.packs, self.pack_digests)
+            except (KeyError, ValueError):
+                self.catalog = self.card_index = None  # Its packs changed: Journal.recover drops the room
+        else:
+            self.catalog = get_catalog()
+            self.card_index = get_index()
+        self.clock = time.time
+        self.journal = None
+        self.analytics = None
+
+    def _record(self, op, *args):
+        """Hands a mutation to the journal, if one is attached."""
+        if self.journal:
+            self.journal(self.roomcode, op, args)
+
     def add_player(self, username):
         """Adds a new player or returns existing one if reconnecting."""
-        if username in self.players_map:
-            return self.players_map[username]
+        self._record("add_player", username)
+        existing = self.get_player(username)
+        if existing:
+            return existing
 
-        new_player = Player(username)
+        new_player = Player(username, len(self.players))
         self.players.append(new_player)
-        self.players_map[username] = new_player
+        self.player_index[username] = new_player.index
+        self._mark("players")
         return new_player
 
+    def get_player(self, username):
+        """Looks a player up by name (or None)."""
+        index = self.player_index.get(username)
+        return self.players[index] if index is not None else None
+
     def start_selection_phase(self):
         """
         Transition from LOBBY to SELECTION.
         Assigns teams, captains, and deals 8 random cards to everyone.
         """
+        self._record("start_selection_phase")
         if len(self.players) < 4:
             return False, "Need at least 4 players."
 
-        # 1. Randomize and Assign Teams
-        random.shuffle(self.players)
+        # 1. Randomize and Assign Teams (alternating positions)
+        self.rng.shuffle(self.players)
+        self.teams = {1: [], 2: []}
         for i, player in enumerate(self.players):
+            player.index = i
             player.team = (i % 2) + 1
+            self.player_index[player.user] = i
+            self.teams[player.team].append(i)
 
         self.team_one_score = 0
         self.team_two_score = 0
 
         # 2. Assign Captains (First player of each team list)
-        t1 = [p for p in self.players if p.team == 1]
-        t2 = [p for p in self.players if p.team == 2]
-
-        self.team_one_captain = t1[0]
-        self.team_two_captain = t2[0]
+        self.team_one_captain = self.players[self.teams[1][0]]
+        self.team_two_captain = self.players[self.teams[2][0]]
         self.current_captain_chooser = self.team_one_captain  # Team 1 always starts choosing
 
-        # 3. Deal Cards
-        total_needed = len(self.players) * 8
-        deck = random.sample(cards, total_needed)
-
-        start_index = 0
-        for player in self.players:
-            player.initial_cards = deck[start_index: start_index + 8]
-            start_index += 8
+        # 3. Deal Cards (card ids, no repeated names, nothing seen in earlier matches)
+        try:
+            hands = self._deal()
+        except ValueError:
+            # This room has been through almost the whole catalog: start over
+            self.seen_cards.clear()
+            self.seen_cards.update(self.excluded_cards)
+            hands = self._deal()
+
+        # With card stats, swap cards between hands so each is about as hard as the others
+        # (not with packs: their cards have no stats)
+        if self.analytics is not None and not self.packs:
+            balance_hands(self.card_index, hands, self.analytics.difficulty, self.rules.max_cards_per_type)
+            self._record("assign_hands", hands)  # Difficulty changes over time, so a replay can't recompute this
+
+        self.assign_hands(hands)
+        for hand in hands:
+            self.seen_cards.update(hand)
 
         self.game_state = "SELECTION"
+        self._mark("state", "players", "scores", "round_info", "turn_deadline")
         return True, "Started"
 
+    def exclude_cards(self, card_ids):
+        """
+        Keeps cards out of every later deal in this room (e.g. picked by the
+        host through search). Returns the ids that weren't excluded yet.
+        """
+        self._record("exclude_cards", card_ids)
+        added = [card_id for card_id in dict.fromkeys(card_ids)
+                 if type(card_id) is int and 0 <= card_id < len(self.catalog) and card_id not in self.excluded_cards]
+        self.excluded_cards.update(added)
+        self.seen_cards.update(added)
+        return added
+
+    def assign_hands(self, hands):
+        """Gives each player (in order) their dealt card ids and clears their selection."""
+        for player, hand in zip(self.players, hands):
+            player.initial_cards = hand
+            player.selected_cards = []
+        self.ready_count = 0
+        self._mark("players")
+
+    def _deal(self):
+        """One hand of rules.hand_size card ids per player."""
+        return deal_hands(self.card_index, len(self.players), self.rules.hand_size,
+                          exclude=self.seen_cards, max_per_type=self.rules.max_cards_per_type, rng=self.rng)
+
     def submit_selection(self, username, selected_indices):
         """
-        Processes a player's choice of 5 cards.
+        Processes a player's choice of cards to keep (rules.keep_size).
         If all players have submitted, it compiles the game deck.
         """
-        player = self.players_map.get(username)
+        self._record("submit_selection", username, selected_indices)
+        player = self.get_player(username)
         if not player: return False
 
-        # Convert UI indices to Card Objects
+        # Convert UI indices to card ids
         selected = []
         for idx in selected_indices:
             if 0 <= idx < len(player.initial_cards):
                 selected.append(player.initial_cards[idx])
 
-        if len(selected) != 5: return False
+        if len(selected) != self.rules.keep_size: return False
 
+        if not player.selected_cards:
+            self.ready_count += 1
         player.selected_cards = selected
+        self._mark("players")
 
         # Check if everyone is ready
-        all_ready = all(len(p.selected_cards) == 5 for p in self.players)
-        if all_ready:
+        if self.ready_count == len(self.players):
             self.compile_match_deck()
 
         return True
@@ -143,17 +300,17 @@ class Room:
         master_list = []
         for p in self.players:
             master_list.extend(p.selected_cards)
-        random.shuffle(master_list)
+        self.rng.shuffle(master_list)
 
-        # Copy deck for all 3 rounds
-        self.round_one_cards = master_list[:]
-        self.round_two_cards = master_list[:]
-        self.round_three_cards = master_list[:]
+        # Same card tuple for all 3 rounds, each with its own order
+        self.round_one_cards, self.round_two_cards, self.round_three_cards = Deck.for_match(master_list)
         self.game_state = "ROUND_1"
+        self._mark("state")
 
     def set_clue_giver(self, username):
         """Sets who is giving clues this turn."""
-        player = self.players_map.get(username)
+        self._record("set_clue_giver", username)
+        player = self.get_player(username)
         if player:
             self.current_clue_giver = player
             self.start_turn()
@@ -161,28 +318,35 @@ class Room:
     def start_turn(self):
         """Starts the timer and reveals the first card."""
         deck = self._get_current_deck()
+        self._mark("round_info")
         if deck:
-            self.card_in_play = deck[0]
-            # TIMER: Set to 30 seconds from now
-            self.turn_end_timestamp = time.time() + 30
+            self.card_in_play = deck.peek()
+            self.turn_id += 1
+            # TIMER: Set to rules.turn_seconds (30 by default) from now
+            self.card_shown_at = self.clock()
+            self.turn_end_timestamp = self.card_shown_at + self.rules.turn_seconds
+            self._mark("turn_deadline")
         else:
             self.end_round()
 
     def guess_correct(self):
         """Logic when 'Got it!' is pressed."""
-
+        if self.current_clue_giver is None: return  # Between turns (a late tap)
+        self._record("guess_correct")
 
         # Allow 1 second buffer for latency
-        if self.turn_end_timestamp > 0 and time.time() > self.turn_end_timestamp + 1:
+        if self.turn_end_timestamp > 0 and self.clock() > self.turn_end_timestamp + TURN_GRACE_SECONDS:
             return
 
         deck = self._get_current_deck()
         if not deck: return
 
         # Remove card from deck
-        deck.pop(0)
+        self._outcome(GUESSED)
+        deck.draw()
 
         # Add points
+        self._mark("scores", "round_info")
         if self.current_clue_giver.team == 1:
             self.team_one_score += 1
         else:
@@ -190,24 +354,27 @@ class Room:
 
         # Reveal next card or end round
         if deck:
-            self.card_in_play = deck[0]
+            self.card_in_play = deck.peek()
         else:
             self.end_round()
 
     def skip_card(self):
         """Logic when 'Skip' is pressed (moves card to bottom)."""
+        if self.current_clue_giver is None: return  # Between turns (a late tap)
+        self._record("skip_card")
         if self.game_state == "ROUND_1": return  # No skipping in Round 1
 
         # Check if time is up here too
-        if self.turn_end_timestamp > 0 and time.time() > self.turn_end_timestamp + 1:
+        if self.turn_end_timestamp > 0 and self.clock() > self.turn_end_timestamp + TURN_GRACE_SECONDS:
             return
 
         deck = self._get_current_deck()
         if not deck: return
 
-        card = deck.pop(0)
-        deck.append(card)
-        self.card_in_play = deck[0]
+        self._outcome(SKIPPED)
+        deck.skip()
+        self.card_in_play = deck.peek()
+        self._mark("round_info")
 
     def taboo_guess(self):
         """
@@ -215,16 +382,20 @@ class Room:
         - Burns the card (removes from play for this round).
         - Awards point to OPPOSING team.
         """
-        if self.turn_end_timestamp > 0 and time.time() > self.turn_end_timestamp + 1:
+        if self.current_clue_giver is None: return  # Between turns (a late tap)
+        self._record("taboo_guess")
+        if self.turn_end_timestamp > 0 and self.clock() > self.turn_end_timestamp + TURN_GRACE_SECONDS:
             return
 
         deck = self._get_current_deck()
         if not deck: return
 
         # Remove card from deck
-        deck.pop(0)
+        self._outcome(BURNED)
+        deck.burn()
 
         # Give point to the other team
+        self._mark("scores", "round_info")
         if self.current_clue_giver.team == 1:
             self.team_two_score += 1  # Point for Team 2
         else:
@@ -232,19 +403,42 @@ class Room:
 
         # Next Card or End Round
         if deck:
-            self.card_in_play = deck[0]
+            self.card_in_play = deck.peek()
         else:
             self.end_round()
 
+    def expire_turn(self, turn_id=None):
+        """
+        Ends the turn only if it is still running.
+        Late or duplicate requests (wrong turn_id, or no turn in progress) are
+        ignored, and not journaled. Returns True if the turn was actually ended.
+        """
+        if self.current_clue_giver is None:
+            return False
+        if turn_id is not None and turn_id != self.turn_id:
+            return False
+        self._record("expire_turn", turn_id)
+        self._outcome(TIMEOUT)
+        self.end_turn()
+        return True
+
+    def _outcome(self, outcome):
+        """Reports what happened to card_in_play to the card stats, if attached."""
+        if self.analytics is not None and self.card_in_play is not None:
+            now = self.clock()
+            if self.card_in_play < len(self.analytics.difficulty):  # Pack cards have no stats
+                self.analytics.record(outcome, self.card_in_play, int(self.game_state[-1]), now - self.card_shown_at)
+            self.card_shown_at = now
+
     def end_turn(self):
         """Clean up after time runs out or turn is ended."""
         # Send the current card to the end of the deck
         deck = self._get_current_deck()
         if deck:
-            card = deck.pop(0)
-            deck.append(card)
+            deck.skip()
 
         # Reset variables for next turn
+        self._mark("round_info", "turn_deadline")
         self.current_clue_giver = None
         self.card_in_play = None
         self.turn_end_timestamp = 0
@@ -258,6 +452,7 @@ class Room:
     def end_round(self):
         """Transitions to the next round or finishes the game."""
         self.end_turn()
+        self._mark("state")
         if self.game_state == "ROUND_1":
             self.game_state = "ROUND_2"
         elif self.game_state == "ROUND_2":
@@ -266,36 +461,84 @@ class Room:
             self.game_state = "FINISHED"
 
     def _get_current_deck(self):
-        """Helper to get the active card list based on state."""
+        """Helper to get the active Deck based on state."""
         if self.game_state == "ROUND_1": return self.round_one_cards
         if self.game_state == "ROUND_2": return self.round_two_cards
         if self.game_state == "ROUND_3": return self.round_three_cards
-        return []
+        return Deck()
+
+    def get_hand(self, player):
+        """The player's dealt cards as dicts, for the private 'deal_hand' message."""
+        return [self.catalog.card(card_id) for card_id in player.initial_cards]
+
+    def match_card_ids(self):
+        """Ids of every card in this match's deck (empty before ROUND_1)."""
+        return self.round_one_cards.cards
+
+    def _mark(self, *fields):
+        """Flags parts of the public state as changed since the last patch."""
+        self.dirty.update(fields)
+        if "players" in fields:
+            self._roster = None
 
     def get_public_state(self):
         """
         Returns a dictionary representing the Room that is safe to send to frontend.
-        This runs every time an event happens to update the UI.
+        Full snapshot, used when a client joins or falls behind on versions.
         """
-        giver_team = self.current_clue_giver.team if self.current_clue_giver else None
+        state = {
+            "roomcode": self.roomcode,
+            "host": self.creator,
+            "version": self.version
+        }
+        for field in STATE_FIELDS:
+            state[field] = self._build_field(field)
+        return state
 
-        # Calculate seconds remaining based on server time
-        if self.turn_end_timestamp > 0:
-            time_left = max(0, self.turn_end_timestamp - time.time())
-        else:
-            time_left = 0
+    def get_spectator_state(self):
+        """
+        Full snapshot for spectators: the same as get_public_state, but without
+        the card in play (a viewer could read it out to the guessers).
+        """
+        state = self.get_public_state()
+        state["round_info"] = dict(state["round_info"], card=None, card_id=None)
+        return state
+
+    def get_state_patch(self):
+        """
+        Returns only the fields that changed since the last patch, as a new version.
+        Returns None if nothing changed.
+        """
+        if not self.dirty:
+            return None
+
+        changes = {field: self._build_field(field) for field in STATE_FIELDS if field in self.dirty}
+        self.dirty.clear()
+        self.version += 1
+        return {"version": self.version, "base": self.version - 1, "changes": changes}
+
+    def _build_field(self, field):
+        """Builds a single top-level field of the public state."""
+        if field == "state":
+            return self.game_state
+        if field == "players":
+            if self._roster is None:
+                self._roster = [p.to_dict() for p in self.players]
+            return self._roster
+        if field == "scores":
+            return {"1": self.team_one_score, "2": self.team_two_score}
+        if field == "turn_deadline":
+            # Absolute server time in ms, sent once per turn; clients count down
+            # against it with the offset they measured through clock_ping
+            return int(self.turn_end_timestamp * 1000) if self.turn_end_timestamp > 0 else None
+
+        giver_team = self.current_clue_giver.team if self.current_clue_giver else None
 
         return {
-            "roomcode": self.roomcode,
-            "host": self.creator,
-            "state": self.game_state,
-            "players": [p.to_dict() for p in self.players],
-            "scores": {"1": self.team_one_score, "2": self.team_two_score},
-            "round_info": {
-                "captain_chooser": self.current_captain_chooser.user if self.current_captain_chooser else None,
-                "clue_giver": self.current_clue_giver.user if self.current_clue_giver else None,
-                "clue_giver_team": giver_team,
-                "card": self.card_in_play if self.card_in_play else None,
-                "time_remaining": time_left
-            }
-        }
\ No newline at end of file
+            "captain_chooser": self.current_captain_chooser.user if self.current_captain_chooser else None,
+            "clue_giver": self.current_clue_giver.user if self.current_clue_giver else None,
+            "clue_giver_team": giver_team,
+            "card": self.catalog.card(self.card_in_play) if self.card_in_play is not None else None,
+            "card_id": self.card_in_play,
+            "turn_id": self.turn_id
+        }
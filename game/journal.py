@@ -0,0 +1,231 @@
+# Clue & Cue
+# journal.py
+# ---------------- IMPORTS ---------------- #
+from game.background import BackgroundLoop, run_here
+from game.engine import Room
+from contextlib import nullcontext
+import json
+import os
+import pickle
+import threading
+import time
+
+SNAPSHOT_NAME = "snapshot.pickle"
+SEGMENT_PREFIX = "journal-"
+SEGMENT_SUFFIX = ".log"
+
+
+# ---------------- JOURNAL CLASS ---------------- #
+class Journal(BackgroundLoop):
+    """
+    Append-only log of every room mutation, so a restarted worker can rebuild ROOMS.
+
+    Handlers only append a line to an in-memory buffer (record); a background
+    loop writes and fsyncs the buffer in batches every 'interval' seconds.
+    'lock' only covers the buffer, so record() never waits for the disk, and
+    the file work goes through 'offload' (eventlet.tpool.execute under eventlet,
+    so an fsync or a big pickle doesn't stop every greenlet of the worker).
+    Each line is [seq, time, roomcode, op, args]; replaying them in order on
+    Rooms (which draw their randomness from a per-room seed and their time from
+    room.clock) repeats the games exactly.
+
+    Every 'snapshot_every' events the rooms are pickled into one snapshot and
+    the log segments it covers are deleted, so recovery stays short. Rooms are
+    changed (and their events recorded) by room commands, so the pickling runs
+    under 'pause' (RoomActors.pause): no room is halfway through a change and
+    every recorded event is already applied.
+    """
+
+    def __init__(self, directory, interval=0.05, snapshot_every=5000, rooms=None, pause=nullcontext,
+                 offload=run_here):
+        self.directory = directory
+        self.interval = interval
+        self.snapshot_every = snapshot_every
+        self.rooms = rooms  # Callable returning {roomcode: Room} to snapshot
+        self.pause = pause  # Context manager that keeps the rooms from changing
+        self.offload = offload  # offload(function, *args) runs blocking file work and returns its result
+        self.seq = 0  # Last sequence number handed out
+        self.snapshot_seq = 0  # Last sequence number included in the snapshot
+        self.buffer = []
+        self.segment = None  # Open log file
+        self.lock = threading.Lock()  # seq and buffer
+        self.segment_lock = threading.Lock()  # The files: one flush or snapshot at a time, in seq order
+        self.running = False
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, rooms=None, pause=nullcontext, offload=run_here):
+        """
+        A Journal in JOURNAL_DIR (None if unset), flushed every JOURNAL_FLUSH_MS
+        and snapshotted every JOURNAL_SNAPSHOT_EVENTS events.
+        """
+        if not os.environ.get("JOURNAL_DIR"):
+            return None
+        return cls(
+            os.environ["JOURNAL_DIR"],
+            interval=int(os.environ.get("JOURNAL_FLUSH_MS", 50)) / 1000,
+            snapshot_every=int(os.environ.get("JOURNAL_SNAPSHOT_EVENTS", 5000)),
+            rooms=rooms,
+            pause=pause,
+            offload=offload,
+        )
+
+    # --- recording (request path) ---
+
+    def record(self, roomcode, op, args=()):
+        """Queues one event. No I/O happens here."""
+        with self.lock:
+            self.seq += 1
+            self.buffer.append(json.dumps([self.seq, time.time(), roomcode, op, list(args)], default=str))
+
+    def flush(self):
+        """Writes and fsyncs everything queued so far. Returns the number of events written."""
+        with self.segment_lock:
+            lines, first_seq = self._take_buffer()
+            if lines:
+                self.offload(self._append, lines, first_seq)
+        return len(lines)
+
+    def _take_buffer(self):
+        """Empties the buffer. Returns its lines and the seq of the first one."""
+        with self.lock:
+            lines, self.buffer = self.buffer, []
+            return lines, self.seq - len(lines) + 1
+
+    def _append(self, lines, first_seq):
+        """Writes lines to the current segment and fsyncs it (segment_lock held)."""
+        if self.segment is None:
+            self.segment = open(self._segment_path(first_seq), "a", encoding="utf-8")
+        self.segment.write("\n".join(lines) + "\n")
+        self.segment.flush()
+        os.fsync(self.segment.fileno())
+
+    # --- snapshots ---
+
+    def snapshot(self, rooms):
+        """
+        Pickles the rooms as of the current sequence number and drops the log before it.
+        Rooms are held still only while pickling; the file is written after.
+        """
+        with self.segment_lock:
+            with self.pause():
+                lines, first_seq = self._take_buffer()
+                seq = first_seq + len(lines) - 1
+                data = self.offload(pickle.dumps, {"seq": seq, "rooms": dict(rooms)}, pickle.HIGHEST_PROTOCOL)
+            self.offload(self._save_snapshot, lines, first_seq, data)
+            self.snapshot_seq = seq
+
+    def _save_snapshot(self, lines, first_seq, data):
+        """Writes a pickled snapshot and deletes the segments it covers (segment_lock held)."""
+        if lines:
+            self._append(lines, first_seq)  # Kept until the snapshot below is safely on disk
+        if self.segment:
+            self.segment.close()
+            self.segment = None  # The next event starts a new segment
+
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+        seq = first_seq + len(lines) - 1
+        for segment_seq, name in self._segments():
+            if segment_seq <= seq:  # Segments started after the snapshot begin at seq + 1
+                os.remove(os.path.join(self.directory, name))
+
+    # --- recovery ---
+
+    def recover(self):
+        """
+        Rebuilds the rooms from the snapshot and the log after it. Call once at
+        startup, before anything is recorded. Returns {roomcode: Room}.
+        Rooms whose deck packs were changed or deleted since are left out.
+        """
+        rooms, seq = {}, 0
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+            rooms, seq = data["rooms"], data["seq"]
+            for roomcode, room in list(rooms.items()):
+                if room.catalog is None:
+                    print(f"[JOURNAL ERROR] Not restoring {roomcode}: "
+                          f"deck packs {list(room.packs)} changed or are gone")  # LOG
+                    del rooms[roomcode]
+        self.snapshot_seq = seq
+
+        for _, name in self._segments():
+            with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event_seq, at, roomcode, op, args = json.loads(line)
+                    except ValueError:
+                        break  # Torn write at the end of a segment
+                    if event_seq <= seq:
+                        continue
+                    seq = event_seq
+                    try:
+                        replay(rooms, at, roomcode, op, args)
+                    except Exception as e:
+                        print(f"[JOURNAL ERROR] Replaying {op} in {roomcode}: {e}")  # LOG
+
+        self.seq = seq
+        return rooms
+
+    # --- background loop ---
+
+    # --- background loop (see game/background.py) ---
+
+    LOOP_NAME = "JOURNAL"
+
+    def period(self):
+        return self.interval
+
+    def step(self):
+        self.flush()
+        if self.rooms and self.seq - self.snapshot_seq >= self.snapshot_every:
+            self.snapshot(self.rooms())
+
+    # --- files ---
+
+    def _segment_path(self, first_seq):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{first_seq:012d}{SEGMENT_SUFFIX}")
+
+    def _segments(self):
+        """[(first seq, file name), ...] in log order."""
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                segments.append((int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]), name))
+        return sorted(segments)
+
+
+# ---------------- REPLAY ---------------- #
+# Room methods that may appear as ops in the log
+REPLAYED_OPS = frozenset({
+    "add_player", "exclude_cards", "start_selection_phase", "assign_hands", "submit_selection", "set_clue_giver",
+    "guess_correct", "skip_card", "taboo_guess", "expire_turn",
+})
+
+
+def replay(rooms, at, roomcode, op, args):
+    """Applies one logged event to the rooms, with the room's clock set to when it happened."""
+    if op == "create":
+        creator, seed = args[:2]
+        rooms[roomcode] = Room(roomcode, creator, seed=seed, packs=args[2] if len(args) > 2 else (),
+                               pack_digests=args[3] if len(args) > 3 else None)
+        return
+    if op == "remove":
+        rooms.pop(roomcode, None)
+        return
+
+    room = rooms.get(roomcode)
+    if room is None or op not in REPLAYED_OPS:
+        return
+    room.clock = lambda: at
+    try:
+        getattr(room, op)(*args)
+    finally:
+        room.clock = time.time
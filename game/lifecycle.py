@@ -0,0 +1,273 @@
+# Clue & Cue
+# lifecycle.py
+# ---------------- IMPORTS ---------------- #
+from collections import Counter, OrderedDict
+import os
+import threading
+import time
+
+# ---------------- MEMORY ESTIMATES ---------------- #
+# Rough per-object sizes, used to keep the process under its memory budget
+ROOM_BASE_BYTES = 4096
+PLAYER_BYTES = 1024
+CARD_BYTES = 64  # A card reference in a hand or a deck slot
+
+
+def estimate_room_size(room):
+    """Cheap estimate of the memory held by a room (bytes)."""
+    cards = sum(len(p.initial_cards) + len(p.selected_cards) for p in room.players)
+    cards += len(room.round_one_cards) + len(room.round_two_cards) + len(room.round_three_cards)
+    return ROOM_BASE_BYTES + PLAYER_BYTES * len(room.players) + CARD_BYTES * cards
+
+
+def socket_rooms(roomcode):
+    """
+    Every Socket.IO room a game's sockets join: everyone, the JSON and binary
+    wire groups (see game/wire.py) and the spectators. All of them are closed
+    when the game is removed, so a reused code never reaches old sockets.
+    """
+    return (roomcode, roomcode + ":json", roomcode + ":bin", roomcode + ":watch")
+
+
+# ---------------- ROOM REGISTRY CLASS ---------------- #
+class RoomRegistry:
+    """
+    Holds the active rooms and decides when they are removed.
+    Works like the old ROOMS dict (code -> Room), but also tracks the last
+    activity and the connected sids of each room, and evicts:
+    - FINISHED games after finished_ttl seconds,
+    - rooms with nobody connected after empty_ttl seconds,
+    - any room without events for idle_ttl seconds,
+    - least recently used rooms while over max_rooms or the memory budget.
+
+    Handlers and room mailboxes (possibly on a thread pool) use it at the same
+    time, so every change and every walk over the rooms holds self.lock.
+    """
+
+    def __init__(self, idle_ttl=3600, empty_ttl=600, finished_ttl=300,
+                 max_rooms=None, memory_budget=None, on_evict=None):
+        self.idle_ttl = idle_ttl
+        self.empty_ttl = empty_ttl
+        self.finished_ttl = finished_ttl
+        self.max_rooms = max_rooms
+        self.memory_budget = memory_budget  # Bytes, or None for no cap
+        self.on_evict = on_evict  # Called as on_evict(room, reason)
+
+        self.rooms = OrderedDict()  # Least recently active first
+        self.last_active = {}
+        self.sids = {}  # Room code -> set of connected sids
+        self.sid_index = {}  # Sid -> (room code, username), so a disconnect needs no search
+        self.watchers = {}  # Room code -> set of spectator sids (never in Room.players)
+        self.watching = {}  # Spectator sid -> room code
+        self.evictions = Counter()  # Reason -> number of rooms evicted
+        self.lock = threading.RLock()  # Reentrant: touch() and memory_used() run inside other methods
+
+    @classmethod
+    def from_env(cls):
+        """
+        Reads the limits from the environment: ROOM_IDLE_TTL, ROOM_EMPTY_TTL,
+        ROOM_FINISHED_TTL (seconds), MAX_ROOMS and ROOM_MEMORY_BUDGET_MB.
+        """
+        return cls(
+            idle_ttl=int(os.environ.get("ROOM_IDLE_TTL", 3600)),
+            empty_ttl=int(os.environ.get("ROOM_EMPTY_TTL", 600)),
+            finished_ttl=int(os.environ.get("ROOM_FINISHED_TTL", 300)),
+            max_rooms=int(os.environ["MAX_ROOMS"]) if os.environ.get("MAX_ROOMS") else None,
+            memory_budget=int(os.environ["ROOM_MEMORY_BUDGET_MB"]) * 1024 * 1024
+            if os.environ.get("ROOM_MEMORY_BUDGET_MB") else None,
+        )
+
+    # --- dict-like access (reading a room counts as activity) ---
+
+    def __contains__(self, roomcode):
+        return roomcode in self.rooms
+
+    def __getitem__(self, roomcode):
+        with self.lock:
+            room = self.rooms[roomcode]
+            self.touch(roomcode)
+            return room
+
+    def __setitem__(self, roomcode, room):
+        with self.lock:
+            self.rooms[roomcode] = room
+            self.sids.setdefault(roomcode, set())
+            self.touch(roomcode)
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def __iter__(self):
+        return iter(self.rooms)
+
+    def get(self, roomcode, default=None):
+        with self.lock:
+            if roomcode not in self.rooms:
+                return default
+            return self[roomcode]
+
+    def values(self):
+        """A list, so it can be walked while other threads add or remove rooms."""
+        with self.lock:
+            return list(self.rooms.values())
+
+    def items(self):
+        with self.lock:
+            return list(self.rooms.items())
+
+    # --- activity tracking ---
+
+    def touch(self, roomcode):
+        """Marks the room as just used (moves it to the back of the LRU order)."""
+        with self.lock:
+            self.last_active[roomcode] = time.time()
+            self.rooms.move_to_end(roomcode)
+
+    def attach(self, roomcode, sid, username=None):
+        """
+        Records a socket connected to the room (as the given player). A socket
+        that was in another room leaves it; returns that (room code, username),
+        or (None, None).
+        """
+        with self.lock:
+            if roomcode not in self.rooms:
+                return None, None
+            previous = self.sid_index.get(sid, (None, None))
+            if previous[0] != roomcode and previous[0] in self.sids:
+                self.sids[previous[0]].discard(sid)  # Otherwise that room would never count as empty
+            else:
+                previous = (None, None)
+            self.sids[roomcode].add(sid)
+            self.sid_index[sid] = (roomcode, username)
+            return previous
+
+    def lookup(self, sid):
+        """(room code, username) of a connected socket, or (None, None)."""
+        return self.sid_index.get(sid, (None, None))
+
+    def detach(self, sid):
+        """Forgets a disconnected socket. Returns its (room code, username), or (None, None)."""
+        with self.lock:
+            roomcode, username = self.sid_index.pop(sid, (None, None))
+            if roomcode in self.sids:
+                self.sids[roomcode].discard(sid)
+            return roomcode, username
+
+    def watch(self, roomcode, sid):
+        """Records a spectator of the room (and no longer of another one). Spectators don't keep a room alive."""
+        with self.lock:
+            if roomcode in self.rooms:
+                if self.watching.get(sid, roomcode) != roomcode:
+                    self.unwatch(sid)
+                self.watchers.setdefault(roomcode, set()).add(sid)
+                self.watching[sid] = roomcode
+
+    def unwatch(self, sid):
+        """Forgets a spectator. Returns the room code it was watching (or None)."""
+        with self.lock:
+            roomcode = self.watching.pop(sid, None)
+            sids = self.watchers.get(roomcode)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self.watchers[roomcode]
+            return roomcode
+
+    # --- eviction ---
+
+    def remove(self, roomcode, reason="removed"):
+        """Removes a room and everything tracked for it."""
+        with self.lock:
+            room = self.rooms.pop(roomcode, None)
+            if room is None:
+                return None
+            self.last_active.pop(roomcode, None)
+            for sid in self.sids.pop(roomcode, ()):
+                self.sid_index.pop(sid, None)
+            for sid in self.watchers.pop(roomcode, ()):
+                self.watching.pop(sid, None)
+            self.evictions[reason] += 1
+        if self.on_evict:
+            self.on_evict(room, reason)
+        return room
+
+    def evict(self, roomcode, reason, now=None):
+        """
+        Removes a room picked by expired(), unless it was used since and its TTL
+        reason no longer holds. Returns the room, or None if it was kept.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            if roomcode not in self.rooms:
+                return None
+            if reason not in ("lru", "memory"):
+                reason = self.expired_reason(roomcode, now)
+                if not reason:
+                    return None
+        return self.remove(roomcode, reason)
+
+    def expired_reason(self, roomcode, now):
+        """Returns why a room should be evicted by TTL, or None to keep it."""
+        idle = now - self.last_active[roomcode]
+        if self.rooms[roomcode].game_state == "FINISHED" and idle > self.finished_ttl:
+            return "finished"
+        if not self.sids[roomcode] and idle > self.empty_ttl:
+            return "empty"
+        if idle > self.idle_ttl:
+            return "idle"
+        return None
+
+    def memory_used(self):
+        with self.lock:
+            rooms = list(self.rooms.values())
+        return sum(estimate_room_size(room) for room in rooms)
+
+    def expired(self, now=None):
+        """
+        Runs the TTL policies, then picks the least recently used rooms while
+        over the caps. Returns the (room code, reason) to evict, without removing
+        anything: the caller evicts each room (evict()) where its commands run.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            victims = []
+            kept = []  # Least recently active first
+            for roomcode in self.rooms:
+                reason = self.expired_reason(roomcode, now)
+                if reason:
+                    victims.append((roomcode, reason))
+                else:
+                    kept.append(roomcode)
+
+            if self.max_rooms is not None and len(kept) > self.max_rooms:
+                over = len(kept) - self.max_rooms
+                victims.extend((roomcode, "lru") for roomcode in kept[:over])
+                kept = kept[over:]
+
+            if self.memory_budget is not None:
+                used = sum(estimate_room_size(self.rooms[roomcode]) for roomcode in kept)
+                for roomcode in kept:
+                    if used <= self.memory_budget:
+                        break
+                    used -= estimate_room_size(self.rooms[roomcode])
+                    victims.append((roomcode, "memory"))
+        return victims
+
+    def sweep(self, now=None):
+        """
+        Evicts everything expired() picks, right away (for callers that own
+        every room, e.g. a single-threaded tool). Returns the (room code, reason) evicted.
+        """
+        return [(roomcode, reason) for roomcode, reason in self.expired(now)
+                if self.evict(roomcode, reason, now)]
+
+    def stats(self):
+        """Counts for logs and monitoring."""
+        with self.lock:
+            return {
+                "rooms": len(self.rooms),
+                "connected_sids": len(self.sid_index),
+                "spectators": len(self.watching),
+                "memory_estimate": self.memory_used(),
+                "evictions": dict(self.evictions),
+            }
@@ -0,0 +1,126 @@
+# Clue & Cue
+# mailbox.py
+# ---------------- IMPORTS ---------------- #
+from collections import deque
+from contextlib import contextmanager
+import threading
+
+
+# ---------------- MAILBOX CLASS ---------------- #
+class Mailbox:
+    """Commands waiting for one room, and whether someone is running them."""
+
+    __slots__ = ("queue", "lock", "busy")
+
+    def __init__(self):
+        self.queue = deque()
+        self.lock = threading.Lock()
+        self.busy = False
+
+
+# ---------------- ROOM ACTORS CLASS ---------------- #
+class RoomActors:
+    """
+    One mailbox per room: commands for a room run one at a time, in the order
+    they were submitted, while different rooms run in parallel.
+
+    Without an executor, whoever submits to an idle mailbox runs it right
+    away (and then anything queued behind it); submitting to a busy one just
+    queues the command for the caller that is already running it. That works
+    the same under eventlet and with real threads. With an executor (e.g. a
+    ThreadPoolExecutor in threading async_mode), idle mailboxes are drained
+    on the pool instead, and submit never blocks.
+
+    Commands may run on another thread than the one that submitted them, so
+    they must not rely on the Flask request context.
+
+    pause() waits for the commands that are running and holds new ones back,
+    so the rooms can be read (e.g. pickled by the journal) between commands.
+    """
+
+    def __init__(self, executor=None):
+        self.executor = executor
+        self.mailboxes = {}  # Room code -> Mailbox
+        self.lock = threading.Lock()
+
+        # Commands running right now, and whether pause() is waiting for them or holding
+        self.gate = threading.Condition()
+        self.active = 0
+        self.pausing = False
+        self.local = threading.local()  # depth: commands this thread is inside (a drain can start another inline)
+
+    def submit(self, roomcode, command, *args):
+        """Queues command(*args) for the room. Returns True if this call started running the mailbox."""
+        box = self.mailboxes.get(roomcode)
+        if box is None:
+            with self.lock:
+                box = self.mailboxes.setdefault(roomcode, Mailbox())
+
+        with box.lock:
+            box.queue.append((command, args))
+            if box.busy:
+                return False
+            box.busy = True
+
+        if self.executor:
+            self.executor.submit(self._drain, roomcode, box)
+        else:
+            self._drain(roomcode, box)
+        return True
+
+    def _drain(self, roomcode, box):
+        while True:
+            with box.lock:
+                if not box.queue:
+                    box.busy = False
+                    return
+                command, args = box.queue.popleft()
+            self._enter()
+            try:
+                command(*args)
+            except Exception as e:
+                print(f"[ROOM ERROR] {roomcode}: {e!r}")  # LOG
+            finally:
+                self._leave()
+
+    def _enter(self):
+        depth = getattr(self.local, "depth", 0)
+        if not depth:
+            with self.gate:
+                while self.pausing:
+                    self.gate.wait()
+                self.active += 1
+        self.local.depth = depth + 1
+
+    def _leave(self):
+        self.local.depth -= 1
+        if not self.local.depth:
+            with self.gate:
+                self.active -= 1
+                if not self.active:
+                    self.gate.notify_all()
+
+    @contextmanager
+    def pause(self):
+        """Runs the 'with' block while no room command is running (new ones wait until it ends)."""
+        with self.gate:
+            while self.pausing:
+                self.gate.wait()
+            self.pausing = True  # From here new commands wait, so a busy server can't starve the pause
+            while self.active:
+                self.gate.wait()
+        try:
+            yield
+        finally:
+            with self.gate:
+                self.pausing = False
+                self.gate.notify_all()
+
+    def discard(self, roomcode):
+        """Forgets the mailbox of a removed room (commands already queued still run)."""
+        with self.lock:
+            self.mailboxes.pop(roomcode, None)
+
+    def backlog(self):
+        """Commands waiting, over all rooms."""
+        return sum(len(box.queue) for box in list(self.mailboxes.values()))
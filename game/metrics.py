@@ -0,0 +1,221 @@
+# Clue & Cue
+# metrics.py
+# ---------------- IMPORTS ---------------- #
+from bisect import bisect_left
+from contextvars import ContextVar
+import functools
+import inspect
+import json
+import threading
+import time
+
+# ---------------- BUCKETS ---------------- #
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)  # Seconds
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144)  # Bytes
+
+_current_event = ContextVar("current_event", default=None)  # EventCall of the handler running here
+
+
+# ---------------- HISTOGRAM CLASS ---------------- #
+class Histogram:
+    """Fixed-bucket histogram (Prometheus style, cumulative when rendered)."""
+
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+# ---------------- EVENT CALL CLASS ---------------- #
+class EventCall:
+    """One handled Socket.IO event: its name, when it arrived, and whether its latency is recorded later."""
+
+    __slots__ = ("event", "start", "deferred")
+
+    def __init__(self, event):
+        self.event = event
+        self.start = time.perf_counter()
+        self.deferred = False
+
+
+# ---------------- METRICS CLASS ---------------- #
+class Metrics:
+    """
+    In-process counters, histograms and gauges, rendered in the Prometheus text format.
+    Gauges are callbacks, evaluated only when /metrics is scraped.
+    """
+
+    def __init__(self, prefix="clue"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.help = {}
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.gauges = {}  # name -> callback returning [(labels dict, value), ...]
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def gauge(self, name, text, callback, kind="gauge"):
+        """
+        Registers a value read at scrape time; callback() returns a list of (labels dict, value).
+        Use kind="counter" for totals that are kept elsewhere.
+        """
+        self.describe(name, kind, text)
+        self.gauges[name] = callback
+
+    # --- socket.io integration ---
+
+    def instrument(self, event):
+        """
+        Decorator for a Socket.IO handler: counts calls and errors,
+        and records the handler latency. Works on coroutine handlers too.
+        Handlers that queue their work in a room mailbox call defer() and
+        finish() instead, so the latency covers that work and nothing else.
+        """
+        def decorator(handler):
+            if inspect.iscoroutinefunction(handler):
+                @functools.wraps(handler)
+                async def async_wrapper(*args, **kwargs):
+                    call = EventCall(event)
+                    token = _current_event.set(call)
+                    try:
+                        return await handler(*args, **kwargs)
+                    except Exception:
+                        self.inc("socket_event_errors_total", event=event)
+                        raise
+                    finally:
+                        _current_event.reset(token)
+                        self._done(call)
+                return async_wrapper
+
+            @functools.wraps(handler)
+            def wrapper(*args, **kwargs):
+                call = EventCall(event)
+                token = _current_event.set(call)
+                try:
+                    return handler(*args, **kwargs)
+                except Exception:
+                    self.inc("socket_event_errors_total", event=event)
+                    raise
+                finally:
+                    _current_event.reset(token)
+                    self._done(call)
+            return wrapper
+        return decorator
+
+    def _done(self, call):
+        self.inc("socket_events_total", event=call.event)
+        if not call.deferred:
+            self.observe("socket_event_seconds", time.perf_counter() - call.start, event=call.event)
+
+    def defer(self):
+        """
+        Hands the running handler's latency over to whoever calls finish()
+        (e.g. the room mailbox command it queued). Returns its EventCall, or
+        None outside an instrumented handler.
+        """
+        call = _current_event.get()
+        if call is not None:
+            call.deferred = True
+        return call
+
+    def finish(self, call, failed=False):
+        """Records a deferred event's latency (from its arrival until now), and its failure."""
+        if failed:
+            self.inc("socket_event_errors_total", event=call.event)
+        self.observe("socket_event_seconds", time.perf_counter() - call.start, event=call.event)
+
+    def json_module(self):
+        """
+        A json module for SocketIO(json=...) that records the size of every
+        emitted packet, per event name, without serializing anything twice.
+        """
+        metrics = self
+
+        class SizedJSON:
+            @staticmethod
+            def dumps(obj, *args, **kwargs):
+                text = json.dumps(obj, *args, **kwargs)
+                if isinstance(obj, list) and obj and isinstance(obj[0], str):
+                    metrics.observe("socket_emit_bytes", len(text), SIZE_BUCKETS, event=obj[0])
+                return text
+
+            loads = staticmethod(json.loads)
+
+        return SizedJSON
+
+    # --- rendering ---
+
+    def _name(self, name):
+        return f"{self.prefix}_{name}"
+
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ""
+        parts = []
+        for key, value in labels:
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            parts.append(f'{key}="{value}"')
+        return "{" + ",".join(parts) + "}"
+
+    def _header(self, lines, name, kind):
+        text = self.help.get(name, (kind, name))[1]
+        lines.append(f"# HELP {self._name(name)} {text}")
+        lines.append(f"# TYPE {self._name(name)} {kind}")
+
+    def render(self):
+        """Everything in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.counts), h.buckets, h.total, h.count) for key, h in histograms]
+
+        last = None
+        for (name, labels), value in counters:
+            if name != last:
+                self._header(lines, name, "counter")
+                last = name
+            lines.append(f"{self._name(name)}{self._labels(labels)} {value}")
+
+        last = None
+        for (name, labels), counts, buckets, total, count in histograms:
+            if name != last:
+                self._header(lines, name, "histogram")
+                last = name
+            running = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                running += bucket_count
+                lines.append(f"{self._name(name)}_bucket{self._labels(labels + (('le', bound),))} {running}")
+            lines.append(f"{self._name(name)}_sum{self._labels(labels)} {total}")
+            lines.append(f"{self._name(name)}_count{self._labels(labels)} {count}")
+
+        for name, callback in self.gauges.items():
+            self._header(lines, name, self.help[name][0])
+            for labels, value in callback():
+                lines.append(f"{self._name(name)}{self._labels(tuple(sorted(labels.items())))} {value}")
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,407 @@
+# Clue & Cue
+# packs.py
+# ---------------- IMPORTS ---------------- #
+from array import array
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from .background import BackgroundLoop, run_here
+from .catalog import GAME_DIR, get_catalog, normalize
+from .sampler import CardIndex, get_index
+from .search import SearchIndex, add_search_index, get_search_index
+
+# ---------------- SETTINGS ---------------- #
+# Extra decks: every .json/.csv file in the packs directory is one pack, named
+# after the file ('packs/movies-2024.csv' -> 'movies-2024').
+# - JSON: an array of {"name": ..., "type": ...} (or of [name, type]), either
+#   bare or as the first array in the file, e.g. {"cards": [...]},
+# - CSV: a header row with 'name' and 'type' columns, one card per row.
+# Cards that are already in the base catalog (same name ignoring case and
+# accents, same type) are dropped, so a pack only adds what is new.
+PACKS_DIR = os.path.join(os.path.dirname(GAME_DIR), "packs")
+CHUNK_SIZE = 64 * 1024  # Characters read at a time while parsing a JSON pack
+BUILD_SECONDS = 0.5  # How often the loop builds decks that create_room is waiting for
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+# ---------------- STREAMED PARSING ---------------- #
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """
+    Yields the items of the first JSON array in a text file one at a time,
+    reading it in chunks, so a big pack is never in memory as a whole.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos = "", 0
+
+    def more():
+        nonlocal buffer, pos
+        chunk = f.read(chunk_size)
+        buffer, pos = buffer[pos:] + chunk, 0
+        return bool(chunk)
+
+    # Everything up to the opening bracket is skipped
+    while "[" not in buffer:
+        buffer = ""
+        if not more():
+            raise ValueError("no JSON array found")
+    pos = buffer.index("[") + 1
+
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if pos == len(buffer):
+            if not more():
+                raise ValueError("unterminated JSON array")
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if not more():  # Cut at the chunk boundary, unless the file is over
+                raise
+            continue
+        pos = end
+        yield item
+
+
+def parse_json(f):
+    """(name, type) for each card of a JSON pack ('' for missing fields)."""
+    for item in iter_json_array(f):
+        if isinstance(item, dict):
+            yield str(item.get("name") or "").strip(), str(item.get("type") or "").strip()
+        elif isinstance(item, list) and len(item) == 2:
+            yield str(item[0] or "").strip(), str(item[1] or "").strip()
+        else:
+            yield "", ""
+
+
+def parse_csv(f):
+    """(name, type) for each row of a CSV pack ('' for missing fields)."""
+    reader = csv.reader(f)
+    header = [column.strip().casefold() for column in next(reader, [])]
+    if "name" not in header or "type" not in header:
+        raise ValueError("CSV packs need 'name' and 'type' columns")
+    name_at, type_at = header.index("name"), header.index("type")
+    for row in reader:
+        yield (row[name_at].strip() if name_at < len(row) else "",
+               row[type_at].strip() if type_at < len(row) else "")
+
+
+PARSERS = {".json": parse_json, ".csv": parse_csv}
+
+
+# ---------------- PACK CLASS ---------------- #
+class Pack:
+    """One parsed pack file: its new cards as (name, type) pairs, in file order."""
+
+    __slots__ = ("name", "path", "stamp", "version", "cards", "digest", "duplicates", "invalid")
+
+    def __init__(self, name, path, stamp, version, cards, duplicates=0, invalid=0):
+        self.name = name
+        self.path = path
+        self.stamp = stamp  # (mtime_ns, size) of the file when it was parsed
+        self.version = version  # Changes on every reload, so decks built from an older parse aren't reused
+        self.cards = cards
+        # Hash of the cards, saved by the journal so a room isn't restored onto a different pack
+        self.digest = hashlib.sha1("\n".join(f"{n}\t{t}" for n, t in cards).encode("utf-8")).hexdigest()
+        self.duplicates = duplicates  # Rows dropped as already in the catalog (or earlier in the pack)
+        self.invalid = invalid  # Rows without a name or a type
+
+
+# ---------------- PACK CATALOG CLASS ---------------- #
+class PackCatalog:
+    """
+    The base Catalog plus the cards of some packs, with the same interface.
+    Base cards keep their ids and pack cards come after them, so ids meant
+    for the base catalog (CardStats, ...) still point at the same cards.
+    Never changed once built: every room playing the same packs shares it.
+    """
+
+    def __init__(self, base, types, names, type_ids, digests=()):
+        self.base = base
+        self.digests = digests  # Pack.digest of each pack, in order
+        self.base_size = len(base)
+        self.types = types  # The base types, then the ones only packs use
+        self.pack_names = names
+        self.pack_type_ids = type_ids
+
+    def __len__(self):
+        return self.base_size + len(self.pack_names)
+
+    def name(self, card_id):
+        if card_id < self.base_size:
+            return self.base.name(card_id)
+        return self.pack_names[card_id - self.base_size]
+
+    def type_id(self, card_id):
+        if card_id < self.base_size:
+            return self.base.type_id(card_id)
+        return self.pack_type_ids[card_id - self.base_size]
+
+    def type_name(self, card_id):
+        return self.types[self.type_id(card_id)]
+
+    def card(self, card_id):
+        return {"name": self.name(card_id), "type": self.type_name(card_id)}
+
+
+# ---------------- PACK LIBRARY CLASS ---------------- #
+class PackLibrary(BackgroundLoop):
+    """
+    The packs in a directory, re-read when their files change (refresh, run
+    by a background loop every 'interval' seconds) without a restart.
+
+    deck(names) gives the catalog and CardIndex for the base cards plus some
+    packs. They are built once per combination of pack versions (the index
+    only normalizes the pack cards, the base tables are copied) and shared
+    by every room that picked those packs. A reloaded pack gets a new
+    version, so new rooms get a new deck while running rooms keep theirs.
+
+    Decks are built on the loop, never by create_room: when a pack loads or
+    changes, for it alone and for every combination rooms asked for
+    ('wanted'); a new combination is queued by prepare() and built within
+    BUILD_SECONDS. Slow work goes through 'offload' (see app.blocking_io).
+    """
+
+    def __init__(self, directory=PACKS_DIR, interval=5, catalog=None, index=None):
+        self.directory = directory
+        self.interval = interval
+        self.catalog = catalog or get_catalog()
+        self.index = index or get_index()
+        self.packs = {}  # Pack name -> Pack
+        self.decks = {}  # ((pack name, version), ...) -> (PackCatalog, CardIndex)
+        self.wanted = set()  # Pack name tuples asked for by rooms, kept built across reloads
+        self.version = 0  # Last pack version handed out
+        self.base_types = {t.casefold(): t for t in self.catalog.types}
+        self._base_keys = None  # (normalized name, type) of every base card, built on first parse
+        self.lock = threading.Lock()
+        self.running = False
+        self.offload = run_here  # offload(function, *args) runs parsing and deck builds
+        self.last_refresh = time.time()
+        self.refresh()
+
+    @classmethod
+    def from_env(cls):
+        """Packs in DECK_PACKS_DIR (default: packs/), re-read every DECK_PACKS_RELOAD_SECONDS."""
+        return cls(os.environ.get("DECK_PACKS_DIR", PACKS_DIR),
+                   interval=int(os.environ.get("DECK_PACKS_RELOAD_SECONDS", 5)))
+
+    def __contains__(self, name):
+        return name in self.packs
+
+    def describe(self):
+        """[{'name', 'cards'}, ...] for clients choosing packs."""
+        return [{"name": name, "cards": len(pack.cards)} for name, pack in sorted(self.packs.items())]
+
+    # --- loading ---
+
+    def refresh(self):
+        """
+        Parses new and changed pack files, forgets deleted ones and builds the
+        decks that use them. Returns the names that changed.
+        """
+        found = {}
+        if os.path.isdir(self.directory):
+            for filename in os.listdir(self.directory):
+                name, ext = os.path.splitext(filename)
+                if ext.lower() in PARSERS:
+                    path = os.path.join(self.directory, filename)
+                    info = os.stat(path)
+                    found[name] = (path, (info.st_mtime_ns, info.st_size))
+
+        packs = dict(self.packs)
+        changed = []
+        for name, (path, stamp) in found.items():
+            pack = packs.get(name)
+            if pack is not None and pack.path == path and pack.stamp == stamp:
+                continue
+            try:
+                pack = self.offload(self._load, name, path, stamp)
+            except (OSError, ValueError, csv.Error) as e:
+                print(f"[PACKS ERROR] {path}: {e}")  # LOG
+                continue
+            packs[name] = pack
+            changed.append(name)
+            print(f"[PACKS] Loaded {name}: {len(pack.cards)} cards, "
+                  f"{pack.duplicates} duplicates, {pack.invalid} invalid rows")  # LOG
+
+        for name in set(packs) - set(found):
+            del packs[name]
+            changed.append(name)
+
+        if changed:
+            self._swap(packs)
+        return changed
+
+    def _swap(self, packs):
+        """Builds the decks the new packs need, then puts the packs and their decks in place together."""
+        with self.lock:
+            wanted = {names for names in self.wanted if all(name in packs for name in names)}
+            old_decks = self.decks
+        decks = {}
+        for names in wanted | {(name,) for name in packs}:
+            chosen = [packs[name] for name in names]
+            key = deck_key(chosen)
+            decks[key] = old_decks.get(key) or self._new_deck(chosen)
+        with self.lock:
+            self.packs = packs
+            self.decks = decks
+            self.wanted = {names for names in self.wanted if all(name in packs for name in names)}
+
+    def _load(self, name, path, stamp):
+        """Parses one file, dropping cards the base catalog (or the pack itself) already has."""
+        if self._base_keys is None:
+            catalog = self.catalog
+            self._base_keys = {(normalize(catalog.name(c)), catalog.type_name(c).casefold())
+                               for c in range(len(catalog))}
+        seen = set()
+        cards = []
+        duplicates = invalid = 0
+        parse = PARSERS[os.path.splitext(path)[1].lower()]
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            for card_name, type_name in parse(f):
+                if not card_name or not type_name:
+                    invalid += 1
+                    continue
+                type_name = self.base_types.get(type_name.casefold(), type_name)  # 'movie' -> 'Movie'
+                key = (normalize(card_name), type_name.casefold())
+                if key in self._base_keys or key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                cards.append((card_name, type_name))
+        self.version += 1
+        return Pack(name, path, stamp, self.version, tuple(cards), duplicates, invalid)
+
+    # --- decks ---
+
+    def prepare(self, names):
+        """
+        True if the deck for these packs is built, so deck() only looks it up.
+        Otherwise queues it for the loop and returns False. Unknown names raise KeyError.
+        """
+        with self.lock:
+            packs = self._lookup(names)
+            if deck_key(packs) in self.decks:
+                return True
+            self.wanted.add(tuple(pack.name for pack in packs))
+            return False
+
+    def deck(self, names, digests=None):
+        """
+        (catalog, index) for the base cards plus the named packs, shared by
+        every caller asking for the same packs. Unknown names raise KeyError.
+        With digests (a room being restored, see PackCatalog.digests), packs
+        whose cards changed since raise ValueError: card ids would point
+        at other cards.
+        """
+        with self.lock:
+            packs = self._lookup(names)
+            if digests is not None and tuple(digests) != tuple(pack.digest for pack in packs):
+                raise ValueError(f"Deck packs {list(names)} changed since the room was created")
+            key = deck_key(packs)
+            deck = self.decks.get(key)
+        if deck is not None:
+            return deck
+
+        # Not prepared (journal recovery, tools): built right here, and kept built from now on
+        deck = self._new_deck(packs)
+        with self.lock:
+            self.wanted.add(tuple(pack.name for pack in packs))
+            return self.decks.setdefault(key, deck)
+
+    def _lookup(self, names):
+        """The Packs for names, without repeats (lock held)."""
+        packs = []
+        for name in dict.fromkeys(names):
+            pack = self.packs.get(name)
+            if pack is None:
+                raise KeyError(name)
+            packs.append(pack)
+        return packs
+
+    def build_wanted(self):
+        """Builds the decks prepare() queued. Returns how many were built."""
+        with self.lock:
+            missing = []
+            for names in self.wanted:
+                packs = [self.packs[name] for name in names]
+                if deck_key(packs) not in self.decks:
+                    missing.append(packs)
+        for packs in missing:
+            deck = self._new_deck(packs)
+            with self.lock:
+                if all(self.packs.get(pack.name) is pack for pack in packs):  # Not reloaded meanwhile
+                    self.decks.setdefault(deck_key(packs), deck)
+        return len(missing)
+
+    def _new_deck(self, packs):
+        """
+        Builds the (catalog, index) of some packs through offload, with the
+        catalog's SearchIndex, so a room's first /search doesn't build it.
+        """
+        catalog, index, search_index = self.offload(self._build, packs, get_search_index())
+        add_search_index(catalog, search_index)
+        return catalog, index
+
+    def _build(self, packs, base_search):
+        types = list(self.catalog.types)
+        type_ids = {type_name: i for i, type_name in enumerate(types)}
+        folded = dict(self.base_types)
+        names = []
+        pack_type_ids = array("H")
+        seen = set()  # Only needed when several packs could repeat each other
+        for pack in packs:
+            for card_name, type_name in pack.cards:
+                type_name = folded.setdefault(type_name.casefold(), type_name)
+                if len(packs) > 1:
+                    key = (normalize(card_name), type_name.casefold())
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                if type_name not in type_ids:
+                    type_ids[type_name] = len(types)
+                    types.append(type_name)
+                names.append(card_name)
+                pack_type_ids.append(type_ids[type_name])
+
+        catalog = PackCatalog(self.catalog, tuple(types), tuple(names), pack_type_ids,
+                              tuple(pack.digest for pack in packs))
+        return catalog, CardIndex.extend(self.index, catalog), SearchIndex.extend(base_search, catalog)
+
+    # --- background loop (see game/background.py) ---
+
+    LOOP_NAME = "PACKS"
+
+    def period(self):
+        return BUILD_SECONDS
+
+    def step(self):
+        """Builds the decks rooms are waiting for; every 'interval' seconds (if any) re-reads the files."""
+        if self.interval and time.time() - self.last_refresh >= self.interval:
+            self.last_refresh = time.time()
+            self.refresh()
+        self.build_wanted()
+
+
+def deck_key(packs):
+    """Key of PackLibrary.decks: the packs in order, with the version each was parsed as."""
+    return tuple((pack.name, pack.version) for pack in packs)
+
+
+_library = None
+
+
+def get_library():
+    """Returns the shared PackLibrary (see PackLibrary.from_env)."""
+    global _library
+    if _library is None:
+        _library = PackLibrary.from_env()
+    return _library
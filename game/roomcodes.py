@@ -0,0 +1,109 @@
+# Clue & Cue
+# roomcodes.py
+# ---------------- IMPORTS ---------------- #
+from array import array
+from collections import deque
+import random
+import threading
+import time
+
+from .sharding import CODE_SPACE, ShardMap, code_to_index, index_to_code
+
+
+# ---------------- ALLOCATOR CLASS ---------------- #
+class RoomCodeAllocator:
+    """
+    Hands out 4-letter room codes from this worker's share of the 26^4 space.
+    - Free codes live in a list that is shuffled lazily: allocate() swaps a
+      random free code to the end and pops it, so it's O(1) with no start-up shuffle.
+    - A code is never handed out twice while in use.
+    - Released codes cool down for 'cooldown' seconds before they can be reused,
+      so a stale link doesn't land in somebody else's new game.
+    - Safe to share between threads (create_room handlers and room evictions).
+    """
+
+    def __init__(self, shards=None, cooldown=600, rng=random):
+        self.shards = shards or ShardMap()
+        self.cooldown = cooldown
+        self.rng = rng
+
+        step = self.shards.worker_count
+        self.capacity = len(range(self.shards.worker_index, CODE_SPACE, step))
+        self.free = array("I", range(self.capacity))  # Local code numbers
+        self.position = array("I", range(self.capacity))  # Local number -> slot in self.free
+        self.in_use = bytearray(self.capacity)
+        self.cooling = deque()  # (time it can be reused, local number), oldest first
+        self.lock = threading.Lock()
+
+    def _local(self, roomcode):
+        """This worker's number for a code, or None if the code isn't ours."""
+        if not self.shards.owns(roomcode):
+            return None
+        return code_to_index(roomcode) // self.shards.worker_count
+
+    def _code(self, local):
+        return index_to_code(local * self.shards.worker_count + self.shards.worker_index)
+
+    def _take(self, slot):
+        """Removes the free code at 'slot' by swapping it with the last one."""
+        last = self.free[-1]
+        local = self.free[slot]
+        self.free[slot] = last
+        self.position[last] = slot
+        self.free.pop()
+        self.in_use[local] = 1
+        return local
+
+    def _recycle(self, now):
+        """Returns codes whose cool-down is over to the free list."""
+        while self.cooling and self.cooling[0][0] <= now:
+            _, local = self.cooling.popleft()
+            self.position[local] = len(self.free)
+            self.free.append(local)
+
+    def allocate(self):
+        """Returns an unused room code. Raises RuntimeError if every code is taken."""
+        with self.lock:
+            self._recycle(time.time())
+            if not self.free:
+                raise RuntimeError("No free room codes left.")
+            return self._code(self._take(self.rng.randrange(len(self.free))))
+
+    def reserve(self, roomcode):
+        """Marks a specific code as used (e.g. a room restored after a restart)."""
+        local = self._local(roomcode)
+        if local is None:
+            return False
+        with self.lock:
+            if self.in_use[local]:
+                return False
+            slot = self.position[local]
+            if slot >= len(self.free) or self.free[slot] != local:
+                return False  # Still cooling down
+            self._take(slot)
+            return True
+
+    def release(self, roomcode):
+        """Gives a code back; it becomes available again after the cool-down."""
+        local = self._local(roomcode)
+        if local is None:
+            return False
+        with self.lock:
+            if not self.in_use[local]:
+                return False
+            self.in_use[local] = 0
+            self.cooling.append((time.time() + self.cooldown, local))
+            return True
+
+    def stats(self):
+        """Occupancy numbers, to see how close we are to running out of codes."""
+        with self.lock:
+            free, cooling = len(self.free), len(self.cooling)
+        used = self.capacity - free - cooling
+        return {
+            "capacity": self.capacity,
+            "in_use": used,
+            "cooling": cooling,
+            "free": free,
+            "occupancy": used / self.capacity if self.capacity else 0.0,
+        }
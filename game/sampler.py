@@ -0,0 +1,198 @@
+# Clue & Cue
+# sampler.py
+# ---------------- IMPORTS ---------------- #
+from array import array
+import random
+
+from .catalog import get_catalog, normalize
+
+
+# ---------------- BITSET CLASS ---------------- #
+class Bitset:
+    """Compact set of card ids (one bit per card in the catalog)."""
+
+    __slots__ = ("bits",)
+
+    def __init__(self, size):
+        self.bits = bytearray((size + 7) // 8)
+
+    def __contains__(self, card_id):
+        return self.bits[card_id >> 3] & (1 << (card_id & 7)) != 0
+
+    def add(self, card_id):
+        self.bits[card_id >> 3] |= 1 << (card_id & 7)
+
+    def update(self, card_ids):
+        for card_id in card_ids:
+            self.add(card_id)
+
+    def clear(self):
+        self.bits = bytearray(len(self.bits))
+
+    def count(self):
+        return sum(bin(byte).count("1") for byte in self.bits)
+
+
+# ---------------- CARD INDEX CLASS ---------------- #
+class CardIndex:
+    """
+    Lookup tables over a catalog, built once per process:
+    - by_type[type_id]: ids of every card of that type,
+    - name_group[card_id]: the same number for cards whose names only differ
+      by case/accents ('Batman' under two types), so a match never deals both.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.by_type = [array("I") for _ in catalog.types]
+        self.name_group = array("I")
+        self.groups = {}  # Normalized name -> group number
+        self._add(0)
+
+    @classmethod
+    def extend(cls, base, catalog):
+        """
+        Index for a catalog whose first cards are base.catalog's (e.g. a
+        packs.PackCatalog): base's tables are copied, only the cards after
+        them are normalized and added.
+        """
+        index = cls.__new__(cls)
+        index.catalog = catalog
+        index.by_type = [array("I", ids) for ids in base.by_type]
+        index.by_type += [array("I") for _ in catalog.types[len(base.by_type):]]
+        index.name_group = array("I", base.name_group)
+        index.groups = dict(base.groups)
+        index._add(len(base))
+        return index
+
+    def _add(self, first_id):
+        """Indexes the cards from first_id to the end of the catalog."""
+        catalog, groups = self.catalog, self.groups
+        for card_id in range(first_id, len(catalog)):
+            self.by_type[catalog.type_id(card_id)].append(card_id)
+            key = normalize(catalog.name(card_id))
+            self.name_group.append(groups.setdefault(key, len(groups)))
+        self.group_count = len(groups)
+        self.types_in_use = [t for t, ids in enumerate(self.by_type) if ids]
+
+    def __len__(self):
+        return len(self.name_group)
+
+
+_index = None
+
+
+def get_index():
+    """Returns the shared CardIndex for the base catalog."""
+    global _index
+    if _index is None:
+        _index = CardIndex(get_catalog())
+    return _index
+
+
+# ---------------- DEALING ---------------- #
+
+def deal_hands(index, hand_count, hand_size, exclude=None, max_per_type=None, balance=False, rng=random):
+    """
+    Deals hand_count hands of hand_size card ids with no two cards sharing a name.
+    - exclude: Bitset of ids that must not be dealt (e.g. seen in earlier matches),
+    - max_per_type: cap on cards of the same type in one hand,
+    - balance: pick a type uniformly first, so big categories don't dominate.
+    Uses rejection sampling, so a deal costs O(cards dealt) while the catalog is
+    far from exhausted. Raises ValueError if the constraints can't be met.
+    """
+    catalog = index.catalog
+    used_groups = set()
+    hands = []
+    attempts_left = 50 * hand_count * hand_size
+
+    for _ in range(hand_count):
+        hand = []
+        type_counts = {}
+        while len(hand) < hand_size:
+            if attempts_left <= 0:
+                card_id = _scan_for_card(index, used_groups, type_counts, exclude, max_per_type, rng)
+            else:
+                attempts_left -= 1
+                if balance:
+                    card_id = rng.choice(index.by_type[rng.choice(index.types_in_use)])
+                else:
+                    card_id = rng.randrange(len(index))
+                if not _allowed(index, card_id, used_groups, type_counts, exclude, max_per_type):
+                    continue
+
+            type_id = catalog.type_id(card_id)
+            type_counts[type_id] = type_counts.get(type_id, 0) + 1
+            used_groups.add(index.name_group[card_id])
+            hand.append(card_id)
+        hands.append(hand)
+
+    return hands
+
+
+def balance_hands(index, hands, difficulty, max_per_type=None):
+    """
+    Swaps cards between hands (in place) so every hand has about the same total
+    difficulty (difficulty[card_id], e.g. CardStats.difficulty). The dealt cards
+    stay the same, so names are still unique, and max_per_type still holds.
+    Each step swaps the pair that best closes the gap between the hardest and
+    the easiest hand; it stops when no swap helps.
+    """
+    if len(hands) < 2:
+        return hands
+    type_id = index.catalog.type_id
+    totals = [sum(difficulty[c] for c in hand) for hand in hands]
+    type_counts = []
+    for hand in hands:
+        counts = {}
+        for card_id in hand:
+            counts[type_id(card_id)] = counts.get(type_id(card_id), 0) + 1
+        type_counts.append(counts)
+
+    for _ in range(len(hands) * len(hands[0])):
+        hard = max(range(len(hands)), key=totals.__getitem__)
+        easy = min(range(len(hands)), key=totals.__getitem__)
+        gap = totals[hard] - totals[easy]
+        best, best_gap = None, gap
+        for i, a in enumerate(hands[hard]):
+            for j, b in enumerate(hands[easy]):
+                delta = difficulty[a] - difficulty[b]
+                if delta <= 0 or abs(gap - 2 * delta) >= best_gap:
+                    continue
+                type_a, type_b = type_id(a), type_id(b)
+                if max_per_type is not None and type_a != type_b and (
+                        type_counts[easy].get(type_a, 0) >= max_per_type
+                        or type_counts[hard].get(type_b, 0) >= max_per_type):
+                    continue
+                best, best_gap = (i, j, delta, type_a, type_b), abs(gap - 2 * delta)
+        if best is None:
+            break
+
+        i, j, delta, type_a, type_b = best
+        hands[hard][i], hands[easy][j] = hands[easy][j], hands[hard][i]
+        totals[hard] -= delta
+        totals[easy] += delta
+        for counts, gone, new in ((type_counts[hard], type_a, type_b), (type_counts[easy], type_b, type_a)):
+            counts[gone] -= 1
+            counts[new] = counts.get(new, 0) + 1
+    return hands
+
+
+def _allowed(index, card_id, used_groups, type_counts, exclude, max_per_type):
+    if exclude is not None and card_id in exclude:
+        return False
+    if index.name_group[card_id] in used_groups:
+        return False
+    if max_per_type is not None and type_counts.get(index.catalog.type_id(card_id), 0) >= max_per_type:
+        return False
+    return True
+
+
+def _scan_for_card(index, used_groups, type_counts, exclude, max_per_type, rng):
+    """Slow path once random picks keep failing: scans from a random start."""
+    start = rng.randrange(len(index))
+    for step in range(len(index)):
+        card_id = (start + step) % len(index)
+        if _allowed(index, card_id, used_groups, type_counts, exclude, max_per_type):
+            return card_id
+    raise ValueError("Not enough cards left to deal.")
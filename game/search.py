@@ -0,0 +1,184 @@
+# Clue & Cue
+# search.py
+# ---------------- IMPORTS ---------------- #
+from array import array
+from collections import Counter
+import math
+import threading
+import weakref
+
+from .catalog import get_catalog, normalize
+
+# ---------------- SETTINGS ---------------- #
+MIN_SHARED = 0.5  # A name must share this fraction of the query's trigrams to be a candidate
+CANDIDATES_PER_RESULT = 4  # Candidates (most shared trigrams first) scored exactly, per result asked for
+MAX_POSTINGS = 2000  # Card ids counted per search at most (rarest lists first), whatever the catalog size
+TYPE_WEIGHT = 0.8  # A card found through its type ranks a bit below one found by name
+SUBSTRING_BONUS = 0.5  # Added when the query appears as is in the name
+
+
+def trigrams(text, pad_end=True):
+    """
+    Trigrams of a normalized text, with a space on each side so word starts
+    (and ends) count. Queries leave the end open, so 'cora' finds 'coracao'.
+    """
+    padded = f" {text} " if pad_end else f" {text}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _add_posting(postings, gram, item):
+    ids = postings.get(gram)
+    if ids is None:
+        ids = postings[gram] = array("I")
+    ids.append(item)
+
+
+# ---------------- SEARCH INDEX CLASS ---------------- #
+class SearchIndex:
+    """
+    Trigram index over a catalog's card names and types, normalized with
+    catalog.normalize (casefolded, accents stripped), so 'explode coracao'
+    finds 'Explode Coração'.
+
+    postings[trigram] holds the ids of the cards whose name contains it, in
+    increasing order; types have their own (much smaller) index, and a type
+    that matches brings its cards along. A search only counts the rarest
+    posting lists (a name sharing MIN_SHARED of the query's trigrams must be
+    in one of them), at most MAX_POSTINGS ids, then scores the few best
+    exactly with substring checks on the padded names. So the cost is
+    bounded whatever the size of the catalog.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.postings = {}  # Trigram -> array of card ids
+        self.padded = []  # ' normalized name ' per card id
+        self.gram_counts = array("H")  # Trigrams in each name
+        self.type_postings = {}  # Trigram -> array of type ids
+        self.type_padded = []  # ' normalized type ' per type id
+        self.by_type = []  # Type id -> array of card ids
+        self._add(0)
+
+    @classmethod
+    def extend(cls, base, catalog):
+        """Index for a catalog that starts with base.catalog's cards (e.g. a packs.PackCatalog)."""
+        index = cls.__new__(cls)
+        index.catalog = catalog
+        index.postings = {gram: array("I", ids) for gram, ids in base.postings.items()}
+        index.padded = list(base.padded)
+        index.gram_counts = array("H", base.gram_counts)
+        index.type_postings = {gram: array("I", ids) for gram, ids in base.type_postings.items()}
+        index.type_padded = list(base.type_padded)
+        index.by_type = [array("I", ids) for ids in base.by_type]
+        index._add(len(base.padded))
+        return index
+
+    def _add(self, first_id):
+        """Indexes the types and cards that come after the ones already indexed."""
+        catalog = self.catalog
+        for type_id in range(len(self.type_padded), len(catalog.types)):
+            text = normalize(catalog.types[type_id])
+            self.type_padded.append(f" {text} ")
+            self.by_type.append(array("I"))
+            for gram in trigrams(text):
+                _add_posting(self.type_postings, gram, type_id)
+
+        for card_id in range(first_id, len(catalog)):
+            text = normalize(catalog.name(card_id))
+            grams = trigrams(text)
+            self.padded.append(f" {text} ")
+            self.gram_counts.append(len(grams))
+            self.by_type[catalog.type_id(card_id)].append(card_id)
+            for gram in grams:
+                _add_posting(self.postings, gram, card_id)
+
+    def __len__(self):
+        return len(self.padded)
+
+    def search(self, query, limit=10):
+        """
+        Best matches for a query as [(score, card id), ...], best first.
+        Scores are the Dice overlap of trigrams with the name (or, times
+        TYPE_WEIGHT, with the type), plus SUBSTRING_BONUS when the name
+        contains the query.
+        """
+        text = normalize(query)
+        grams = trigrams(text, pad_end=False)
+        if not text or not grams:
+            return []
+        size = len(grams)
+        grams = tuple(grams)
+
+        found = {}
+        for card_id in _candidates(self.postings, grams, CANDIDATES_PER_RESULT * limit):
+            padded = self.padded[card_id]
+            shared = len([gram for gram in grams if gram in padded])
+            score = 2 * shared / (size + self.gram_counts[card_id])
+            if text in padded:
+                score += SUBSTRING_BONUS
+            found[card_id] = score
+
+        # Cards of matching types, as long as their name didn't already rank them higher
+        for type_id in _candidates(self.type_postings, grams, 3):
+            padded = self.type_padded[type_id]
+            shared = len([gram for gram in grams if gram in padded])
+            score = TYPE_WEIGHT * 2 * shared / (size + len(padded) - 2)
+            for card_id in self.by_type[type_id][:limit]:
+                if found.get(card_id, 0) < score:
+                    found[card_id] = score
+
+        best = sorted(found.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(round(score, 4), card_id) for card_id, score in best]
+
+
+def _candidates(postings, grams, count):
+    """Ids sharing the most of 'grams', read from the rarest posting lists (see SearchIndex)."""
+    lists = sorted((postings[gram] for gram in grams if gram in postings), key=len)
+    needed = max(1, math.ceil(MIN_SHARED * len(grams)))
+    shared = Counter()
+    budget = MAX_POSTINGS
+    for ids in lists[:len(lists) - needed + 1]:  # Missing trigrams are the rarest lists of all
+        shared.update(ids[:budget] if len(ids) > budget else ids)
+        budget -= len(ids)
+        if budget <= 0:
+            break  # Common query: the rarest lists already hold plenty of candidates
+    if len(shared) <= count:
+        return list(shared)
+    return [item for item, _ in shared.most_common(count)]
+
+
+def search_cards(catalog, query, limit=10, excluded=()):
+    """search() results as the /search route sends them."""
+    return [
+        {"id": card_id, "name": catalog.name(card_id), "type": catalog.type_name(card_id),
+         "score": score, "excluded": card_id in excluded}
+        for score, card_id in get_search_index(catalog).search(query, limit)
+    ]
+
+
+_indexes = weakref.WeakKeyDictionary()  # Catalog -> SearchIndex, dropped with the catalog
+_lock = threading.Lock()
+
+
+def add_search_index(catalog, index):
+    """Registers an index built ahead of time (packs.PackLibrary builds one with every deck)."""
+    with _lock:
+        return _indexes.setdefault(catalog, index)
+
+
+def get_search_index(catalog=None):
+    """
+    The SearchIndex of a catalog (default: the base one), built on first use.
+    Pack catalogs extend the base index instead of starting over.
+    """
+    base = get_catalog()
+    catalog = catalog or base
+    with _lock:
+        index = _indexes.get(catalog)
+        if index is None:
+            base_index = _indexes.get(base)
+            if base_index is None:
+                base_index = _indexes[base] = SearchIndex(base)
+            index = base_index if catalog is base else SearchIndex.extend(base_index, catalog)
+            _indexes[catalog] = index
+    return index
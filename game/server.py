@@ -0,0 +1,604 @@
+# Clue & Cue
+# server.py
+# ---------------- IMPORTS ---------------- #
+import os
+import secrets
+import threading
+import time
+
+from . import wire
+from .analytics import CardStats
+from .broadcast import BroadcastCoalescer
+from .catalog import get_catalog
+from .engine import Room, TURN_GRACE_SECONDS
+from .background import run_here
+from .journal import Journal
+from .lifecycle import RoomRegistry, socket_rooms
+from .mailbox import RoomActors
+from .metrics import SIZE_BUCKETS, Metrics
+from .packs import get_library
+from .roomcodes import RoomCodeAllocator
+from .search import get_search_index, search_cards
+from .sharding import ShardMap
+from .timers import TimingWheel
+
+# ---------------- SETTINGS ---------------- #
+ROOM_SWEEP_SECONDS = 30
+SEARCH_LIMIT = 50  # Most results one /search returns
+
+
+# ---------------- GAME SERVER CLASS ---------------- #
+class GameServer:
+    """
+    Everything app.py (Flask-SocketIO) and asgi_app.py (python-socketio's ASGI
+    server) have in common: the rooms and their mailboxes, turn timers,
+    broadcasts, spectators, the journal, metrics and every Socket.IO handler.
+
+    The handlers are plain functions of (sid, data). The app registers them
+    (handlers()) and gives the server a transport that reaches its clients:
+    - emit(event, data, to, skip_sid=None): send, in order, to a sid or a room,
+    - fan_out(event, data, to): send from a separate task (spectator snapshots),
+    - enter_room(sid, name) / close_room(name): Socket.IO room membership.
+
+    Room commands run in the room's mailbox (in_room), one at a time per
+    room, so they may run on another thread than the handler that queued them.
+    """
+
+    EVENTS = (
+        "create_room", "list_packs", "join_game", "watch_game", "clock_ping", "request_state", "start_game",
+        "exclude_cards", "submit_cards", "select_giver", "action_guess", "action_skip", "action_taboo",
+        "end_turn", "disconnect",
+    )
+
+    def __init__(self, transport, metrics=None, executor=None, offload=run_here):
+        self.transport = transport
+
+        # Per-event counts, latencies and payload sizes, served on /metrics
+        self.metrics = metrics or Metrics()
+
+        # Which rooms this worker owns (a single worker owns them all by default)
+        self.shards = ShardMap.from_env()
+
+        # Free room codes of this worker; released codes cool down before reuse
+        self.room_codes = RoomCodeAllocator(self.shards, cooldown=int(os.environ.get("ROOM_CODE_COOLDOWN", 600)))
+
+        # Active Room objects owned by this worker, evicted when idle or finished
+        self.rooms = RoomRegistry.from_env()
+        self.rooms.on_evict = self.room_evicted
+
+        # One mailbox per room, so a room's commands never interleave (see game/mailbox.py)
+        self.actors = RoomActors(executor)
+
+        # Server-side turn timers (one wheel for every room, advanced by a single background task)
+        self.turn_timers = TimingWheel()
+
+        # Optional crash recovery: every room mutation is journaled to JOURNAL_DIR (see game/journal.py)
+        # Snapshots pause the mailboxes, since every journaled change is a room command;
+        # its fsyncs and pickling go through offload (see app.py)
+        self.journal = Journal.from_env(rooms=lambda: self.rooms.rooms, pause=self.actors.pause, offload=offload)
+
+        # Optional per-card outcome stats, saved to CARD_STATS_FILE (see game/analytics.py)
+        self.card_stats = CardStats.from_env(get_catalog())
+
+        # Extra deck packs from DECK_PACKS_DIR, picked at create_room (decks are built on its loop)
+        self.packs = get_library()
+        self.packs.offload = offload
+
+        # Card search (game/search.py): the base index is built now, pack indexes on their first search
+        get_search_index()
+
+        # Clients that negotiate the compact binary wire (see game/wire.py) sit in the
+        # Socket.IO room '<roomcode>:bin', everyone else in '<roomcode>:json'.
+        # Room code -> sids using the binary wire (so JSON-only rooms never encode frames)
+        self.binary_clients = {}
+        self.binary_lock = threading.Lock()  # Joins, drops and evictions of different rooms may run at once
+
+        # One merged patch per room per frame during rapid play (0 disables coalescing)
+        self.broadcasts = BroadcastCoalescer(self.flush_room,
+                                             window=int(os.environ.get("BROADCAST_WINDOW_MS", 40)) / 1000)
+
+        # Viewers are not players: they sit in the Socket.IO room '<roomcode>:watch' and
+        # get at most one full snapshot (without the card in play) per SPECTATOR_INTERVAL_MS.
+        self.spectators = BroadcastCoalescer(self.flush_spectators,
+                                             window=int(os.environ.get("SPECTATOR_INTERVAL_MS", 1000)) / 1000)
+
+        # Called as on_create(room) after create_room (app.py starts its background tasks then)
+        self.on_create = None
+
+        self.describe_metrics()
+
+    def handlers(self):
+        """{event: handler(sid, *args)}, each instrumented for /metrics, for the app to register."""
+        return {event: self.metrics.instrument(event)(getattr(self, "on_" + event)) for event in self.EVENTS}
+
+    # --- room mailboxes ---
+
+    def in_room(self, roomcode, command, *args, touch=True):
+        """
+        Runs command(room, *args) in the room's mailbox. Returns False if there is no such room.
+        Commands can run on another thread, so they take the sid as an argument
+        and send through the transport instead of replying to a request.
+        touch=False (spectators) doesn't count as activity, so it can't keep the room alive.
+        """
+        room = self.rooms.get(roomcode) if touch else self.rooms.rooms.get(roomcode)
+        if room is None:
+            return False
+        self.actors.submit(roomcode, self.run_command, self.metrics.defer(), command, room, *args)
+        return True
+
+    def run_command(self, call, command, *args):
+        """
+        Runs one mailbox command. Failures are counted in socket_event_errors_total,
+        and the latency of the event that queued it (call) ends here, so it covers
+        the wait in the mailbox but not other commands run by the same thread.
+        """
+        try:
+            command(*args)
+        except Exception:
+            if call:
+                self.metrics.finish(call, failed=True)
+            else:
+                self.metrics.inc("socket_event_errors_total", event=command.__name__)
+            raise
+        if call:
+            self.metrics.finish(call)
+
+    # --- state broadcasting ---
+
+    def uses_binary(self, roomcode, sid):
+        return sid in self.binary_clients.get(roomcode, ())
+
+    def emit_binary(self, event, payload, to, skip_sid=None):
+        """Emits a value as one compact binary frame, recording its size for /metrics."""
+        frame = wire.encode(payload)
+        self.metrics.observe("socket_emit_bytes", len(frame), SIZE_BUCKETS, event=event + ":bin")
+        self.transport.emit(event, frame, to, skip_sid)
+
+    def send_state(self, room, sid):
+        """Sends one client a full snapshot in the format it negotiated."""
+        if self.uses_binary(room.roomcode, sid):
+            if room.game_state.startswith("ROUND") or room.game_state == "FINISHED":
+                self.emit_binary("card_table", wire.card_table(room.catalog, room.match_card_ids()), sid)
+            self.emit_binary("state_update", room.get_public_state(), sid)
+        else:
+            self.transport.emit("state_update", room.get_public_state(), sid)
+
+    def send_hand(self, room, player):
+        """Sends a player their dealt cards (ids with names on the binary wire)."""
+        if self.uses_binary(room.roomcode, player.sid):
+            self.emit_binary("deal_hand", wire.card_table(room.catalog, player.initial_cards), player.sid)
+        else:
+            self.transport.emit("deal_hand", room.get_hand(player), player.sid)
+
+    def broadcast_state(self, room, skip_sid=None, coalesce=False):
+        """
+        Sends the room a versioned patch with only the fields that changed.
+        Clients that missed a version ask for a full snapshot with 'request_state'.
+        With coalesce=True (rapid in-turn taps) the patch waits for the next frame
+        of the broadcasts loop, unless the turn or the phase just changed.
+        """
+        roomcode = room.roomcode
+        if coalesce and self.broadcasts.window > 0 and room.current_clue_giver and "state" not in room.dirty:
+            self.broadcasts.mark(roomcode)
+            return
+
+        self.broadcasts.discard(roomcode)
+        patch = room.get_state_patch()
+        if not patch:
+            return
+        if roomcode in self.rooms.watchers:
+            self.spectators.mark(roomcode)
+
+        self.transport.emit("state_patch", patch, roomcode + ":json", skip_sid)
+        if self.binary_clients.get(roomcode):
+            if patch["changes"].get("state") == "ROUND_1":
+                # Binary clients get card ids from now on, so send the names once
+                self.emit_binary("card_table", wire.card_table(room.catalog, room.match_card_ids()),
+                                 roomcode + ":bin", skip_sid)
+            self.emit_binary("state_patch", patch, roomcode + ":bin", skip_sid)
+
+    def flush_room(self, roomcode):
+        """Called by the broadcasts loop once per frame for each room with pending changes."""
+        room = self.rooms.rooms.get(roomcode)
+        if room:
+            self.actors.submit(roomcode, self.run_command, None, self.broadcast_state, room)
+
+    # --- spectators ---
+
+    def flush_spectators(self, roomcode):
+        """Called by the spectators loop at most once per interval for each changed room."""
+        if roomcode in self.rooms.watchers:
+            self.in_room(roomcode, self.send_spectator_state, touch=False)
+
+    def send_spectator_state(self, room, sid=None):
+        """
+        Builds the snapshot in the room's mailbox, but fans it out from a separate
+        task, so thousands of viewers never hold up the players' next command.
+        """
+        self.transport.fan_out("state_update", room.get_spectator_state(), sid or room.roomcode + ":watch")
+
+    # --- turn timers ---
+
+    def schedule_turn_expiry(self, room):
+        """
+        Arms the authoritative timer for the room's current turn.
+        The server ends the turn itself, so clients no longer need to send end_turn.
+        """
+        self.turn_timers.schedule(room.roomcode, room.turn_end_timestamp + TURN_GRACE_SECONDS,
+                                  self.turn_expired, room.roomcode, room.turn_id)
+
+    def turn_expired(self, roomcode, turn_id):
+        """Called by the timing wheel once per turn when time runs out."""
+        self.in_room(roomcode, self.end_turn, turn_id)
+
+    def end_turn(self, room, turn_id):
+        """Ends the turn once, whether time ran out or a client asked first (in the room's mailbox)."""
+        if room.expire_turn(turn_id):
+            self.turn_timers.cancel(room.roomcode)
+            self.broadcast_state(room)
+
+    def play_card(self, room, action):
+        """Runs one Got it!/Skip/Illegal tap (in the room's mailbox)."""
+        action(room)
+        if not room.current_clue_giver:
+            self.turn_timers.cancel(room.roomcode)  # Deck ran out, the round is over
+        self.broadcast_state(room, coalesce=True)
+
+    # --- room lifecycle ---
+
+    def sweep_rooms(self):
+        """
+        Evicts idle/finished rooms, then re-arms itself on the timing wheel.
+        Each room is removed in its own mailbox, so never halfway through a command.
+        """
+        expired = self.rooms.expired()
+        for roomcode, reason in expired:
+            # Not in_room(): looking the room up would count as activity
+            self.actors.submit(roomcode, self.run_command, None, self.rooms.evict, roomcode, reason)
+        if expired:
+            print(f"[LIFECYCLE] Evicting {len(expired)} rooms, totals: {dict(self.rooms.evictions)}, "
+                  f"codes: {self.room_codes.stats()}")  # LOG
+        self.turn_timers.schedule("__sweep__", time.time() + ROOM_SWEEP_SECONDS, self.sweep_rooms)
+
+    def room_evicted(self, room, reason):
+        """Releases everything the server still holds for an evicted room."""
+        roomcode = room.roomcode
+        self.turn_timers.cancel(roomcode)
+        self.room_codes.release(roomcode)
+        if self.journal:
+            self.journal.record(roomcode, "remove", (reason,))
+        with self.binary_lock:
+            self.binary_clients.pop(roomcode, None)
+        self.actors.discard(roomcode)
+        self.broadcasts.discard(roomcode)
+        self.spectators.discard(roomcode)
+        self.transport.emit("error", {"msg": "This room was closed."}, roomcode)
+        self.transport.emit("error", {"msg": "This room was closed."}, roomcode + ":watch")
+        for name in socket_rooms(roomcode):
+            self.transport.close_room(name)
+
+    def recover(self):
+        """
+        Rebuilds the rooms of the previous run from the journal. Players have to
+        join again (their sockets are gone), and running turns get their timers back.
+        """
+        for roomcode, room in self.journal.recover().items():
+            if not self.shards.owns(roomcode):
+                continue
+            self.room_codes.reserve(roomcode)
+            for p in room.players:
+                p.sid = None
+            room.journal = self.journal.record
+            room.analytics = self.card_stats
+            self.rooms[roomcode] = room
+            if room.current_clue_giver:
+                self.schedule_turn_expiry(room)
+        print(f"[JOURNAL] Recovered {len(self.rooms)} rooms up to event {self.journal.seq}")  # LOG
+
+    # --- search ---
+
+    def search(self, args):
+        """
+        Ranked fuzzy card search for the /search route, from its query arguments:
+        q, limit (up to SEARCH_LIMIT) and room (that room's packs and exclusions).
+        """
+        room = self.rooms.rooms.get(args.get("room", ""))  # Searching isn't activity: it can't keep a room alive
+        catalog = room.catalog if room else get_catalog()
+        try:
+            limit = max(1, min(int(args.get("limit", 10)), SEARCH_LIMIT))
+        except ValueError:
+            limit = 10
+        return {"results": search_cards(catalog, args.get("q", ""), limit, room.excluded_cards if room else ())}
+
+    # --- metrics ---
+
+    def rooms_by_state(self):
+        counts = {}
+        for room in self.rooms.values():
+            counts[room.game_state] = counts.get(room.game_state, 0) + 1
+        return [({"state": state}, count) for state, count in sorted(counts.items())]
+
+    def average_deck_size(self):
+        sizes = [len(room._get_current_deck()) for room in self.rooms.values()
+                 if room.game_state.startswith("ROUND")]
+        return [({}, sum(sizes) / len(sizes) if sizes else 0)]
+
+    def describe_metrics(self):
+        metrics, rooms, room_codes = self.metrics, self.rooms, self.room_codes
+        metrics.describe("socket_events_total", "counter", "Socket.IO events handled")
+        metrics.describe("socket_event_errors_total", "counter", "Socket.IO handlers that raised")
+        metrics.describe("socket_event_seconds", "histogram", "Socket.IO handler latency")
+        metrics.describe("socket_emit_bytes", "histogram", "Size of emitted Socket.IO packets")
+        metrics.gauge("rooms", "Active rooms by game state", self.rooms_by_state)
+        metrics.gauge("connected_players", "Sockets joined to a room", lambda: [({}, len(rooms.sid_index))])
+        metrics.gauge("spectators", "Sockets watching a room", lambda: [({}, len(rooms.watching))])
+        metrics.gauge("average_deck_size", "Cards left in the current round, averaged over rooms in play",
+                      self.average_deck_size)
+        metrics.gauge("room_evictions_total", "Rooms evicted, by reason",
+                      lambda: [({"reason": r}, n) for r, n in sorted(rooms.evictions.items())], kind="counter")
+        metrics.gauge("room_codes_in_use", "Room codes allocated on this worker",
+                      lambda: [({}, room_codes.stats()["in_use"])])
+        metrics.gauge("room_code_occupancy", "Fraction of this worker's room codes in use",
+                      lambda: [({}, room_codes.stats()["occupancy"])])
+
+    # ---------------- SOCKET.IO EVENTS ---------------- #
+
+    def on_create_room(self, sid, data):
+        """
+        Creates a new game room with a random, unused 4-letter code from this worker's partition.
+        Adds the creator as the first player. {"packs": [name, ...]} adds deck packs.
+        """
+        username = data.get("username")
+        packs = [str(name) for name in data.get("packs") or ()]
+        print(f"[DEBUG] Creating room for user: {username}")  # LOG
+
+        try:
+            # A combination of packs nobody played yet is built on the packs loop; the page asks again
+            if packs and not self.packs.prepare(packs):
+                self.transport.emit("packs_pending", {"packs": packs}, sid)
+                return
+        except KeyError as e:
+            self.transport.emit("error", {"msg": f"Unknown deck pack: {e.args[0]}"}, sid)
+            return
+
+        try:
+            roomcode = self.room_codes.allocate()
+        except RuntimeError:
+            self.transport.emit("error", {"msg": "The server is full, try again later."}, sid)
+            return
+
+        try:
+            new_room = Room(roomcode, username, packs=packs)
+        except KeyError as e:
+            self.room_codes.release(roomcode)
+            self.transport.emit("error", {"msg": f"Unknown deck pack: {e.args[0]}"}, sid)
+            return
+        # Journaled like every other change, as a command of the new room's mailbox
+        self.actors.submit(roomcode, self.run_command, self.metrics.defer(), self.add_room, new_room, sid)
+
+    def add_room(self, room, sid):
+        """Registers (and journals) a room made by create_room, then tells its creator."""
+        if self.journal:
+            self.journal.record(room.roomcode, "create", (room.creator, room.seed, room.packs, room.pack_digests))
+            room.journal = self.journal.record
+        room.analytics = self.card_stats
+        self.rooms[room.roomcode] = room
+        if self.on_create:
+            self.on_create(room)
+        self.transport.emit("room_created", {"roomcode": room.roomcode}, sid)
+
+    def on_list_packs(self, sid, data=None):
+        """The deck packs a new room can pick, for the home page."""
+        self.transport.emit("packs", {"packs": self.packs.describe()}, sid)
+
+    def on_join_game(self, sid, data):
+        """
+        Handles a player joining an existing room.
+        Associates the socket session ID (sid) with the player for private messaging.
+        Clients sending {"wire": wire.WIRE_VERSION} get compact binary frames.
+        Every join answers with a 'session' token; a reconnecting player who sends
+        it back only gets a private catch-up, nothing is broadcast to the room.
+        """
+        roomcode = data.get("roomcode")
+        username = data.get("username")
+        token = data.get("token")
+        binary = data.get("wire") == wire.WIRE_VERSION
+
+        print(f"[DEBUG] Join attempt: User='{username}' Room='{roomcode}'")  # LOG
+
+        # --- FIX FOR PHANTOM PLAYERS ---
+        # We explicitly check for None, empty string, 'null', or 'undefined'
+        if not username or username == 'null' or username == 'undefined':
+            print(f"[BLOCKING PHANTOM] Rejected connection with username: {username}")  # LOG
+            self.transport.emit("error", {"msg": "Username required to join."}, sid)
+            return
+        # -----------------------------
+
+        def command(room):
+            player = room.get_player(username)
+            resumed = player is not None and token is not None and player.token == token
+            if not resumed:
+                player = room.add_player(username)
+                player.token = secrets.token_urlsafe(16)
+            player.sid = sid
+
+            self.transport.enter_room(sid, roomcode)
+            if binary:
+                with self.binary_lock:
+                    self.binary_clients.setdefault(roomcode, set()).add(sid)
+                self.transport.enter_room(sid, roomcode + ":bin")
+            else:
+                self.transport.enter_room(sid, roomcode + ":json")
+            self.transport.emit("session", {"token": player.token}, sid)
+
+            # Patch everyone else so they see a new player; the newcomer gets a full snapshot
+            if not resumed:
+                self.broadcast_state(room, skip_sid=sid)
+            self.catch_up(room, player)
+
+        # Indexed before the command is queued, so a disconnect right after this
+        # finds the room and its forget_sid runs after the join, in the same mailbox
+        left, left_username = self.rooms.attach(roomcode, sid, username)
+        if left:
+            self.in_room(left, self.forget_sid, left_username, sid)
+        if not self.in_room(roomcode, command):
+            if not self.shards.owns(roomcode):
+                print(f"[DEBUG] Room '{roomcode}' belongs to worker {self.shards.owner(roomcode)}")  # LOG
+            self.transport.emit("error", {"msg": "Room not found"}, sid)
+
+    def catch_up(self, room, player):
+        """Everything a (re)joining player needs, sent to them alone: a snapshot, and their hand while choosing."""
+        self.send_state(room, player.sid)
+        if room.game_state == "SELECTION" and not player.selected_cards:
+            self.send_hand(room, player)
+
+    def on_watch_game(self, sid, data):
+        """
+        Joins a room as a spectator (no username, not in Room.players).
+        Spectators get a snapshot now and throttled snapshots after that.
+        """
+        roomcode = data.get("roomcode")
+        if roomcode not in self.rooms:
+            self.transport.emit("error", {"msg": "Room not found"}, sid)
+            return
+        self.rooms.watch(roomcode, sid)
+        self.transport.enter_room(sid, roomcode + ":watch")
+        self.in_room(roomcode, self.send_spectator_state, sid, touch=False)
+
+    def on_clock_ping(self, sid, data):
+        """
+        NTP-style clock sync: the client sends its send time t0 and, with its own
+        receive time t3, estimates offset = server - (t0 + t3) / 2 from the reply.
+        Answered right here, outside any room mailbox, so the echo isn't delayed.
+        """
+        self.transport.emit("clock_pong", {"t0": data.get("t0"), "server": time.time() * 1000}, sid)
+
+    def on_request_state(self, sid, data):
+        """
+        Sends a full snapshot to a client that fell behind on state versions.
+        Only a player's request counts as activity, not a spectator's.
+        """
+        roomcode = data.get("roomcode")
+        self.in_room(roomcode, self.resync, sid, touch=self.rooms.lookup(sid)[0] == roomcode)
+
+    def resync(self, room, sid):
+        """Only players seated in the room get the public state; spectators (and anyone else) the spectator view."""
+        if self.rooms.lookup(sid)[0] == room.roomcode:
+            self.send_state(room, sid)
+        else:
+            self.send_spectator_state(room, sid)
+
+    def on_start_game(self, sid, data):
+        """
+        Starts the game (moves from LOBBY to SELECTION phase).
+        Only the room creator (host) is allowed to trigger this.
+        """
+        username = data.get("username")
+
+        def command(room):
+            if room.creator != username:
+                self.transport.emit("error", {"msg": "Only the host can start the game!"}, sid)
+                return
+
+            success, msg = room.start_selection_phase()
+            if success:
+                self.broadcast_state(room)
+                for p in room.players:
+                    if p.sid:
+                        self.send_hand(room, p)
+            else:
+                self.transport.emit("error", {"msg": msg}, sid)
+
+        self.in_room(data.get("roomcode"), command)
+
+    def on_exclude_cards(self, sid, data):
+        """
+        The host keeps cards (ids from /search) out of every later deal in the room.
+        Answers the host alone with the room's whole excluded list.
+        """
+        username = data.get("username")
+        card_ids = data.get("card_ids") or []
+
+        def command(room):
+            if room.creator != username:
+                self.transport.emit("error", {"msg": "Only the host can exclude cards!"}, sid)
+                return
+            room.exclude_cards(card_ids)
+            self.transport.emit("excluded_cards", {"card_ids": sorted(room.excluded_cards)}, sid)
+
+        self.in_room(data.get("roomcode"), command)
+
+    def on_submit_cards(self, sid, data):
+        """
+        Receives the 5 chosen cards from a player.
+        """
+        username = data.get("username")
+        indices = data.get("indices")
+
+        def command(room):
+            room.submit_selection(username, indices)
+            self.broadcast_state(room)
+
+        self.in_room(data.get("roomcode"), command)
+
+    def on_select_giver(self, sid, data):
+        """
+        Captain selects which teammate will give the clues.
+        """
+        target_user = data.get("target_user")
+
+        def command(room):
+            room.set_clue_giver(target_user)
+            if room.current_clue_giver:
+                self.schedule_turn_expiry(room)
+            self.broadcast_state(room)
+
+        self.in_room(data.get("roomcode"), command)
+
+    def on_action_guess(self, sid, data):
+        """
+        The Clue Giver confirms their team guessed correctly.
+        """
+        self.in_room(data.get("roomcode"), self.play_card, Room.guess_correct)
+
+    def on_action_skip(self, sid, data):
+        """
+        The Clue Giver skips the current card (only allowed in R2/R3).
+        """
+        self.in_room(data.get("roomcode"), self.play_card, Room.skip_card)
+
+    def on_action_taboo(self, sid, data):
+        """
+        The Clue Giver marks the current clue as illegal/taboo.
+        Burns the card and gives a point to the opposing team.
+        """
+        self.in_room(data.get("roomcode"), self.play_card, Room.taboo_guess)
+
+    def on_end_turn(self, sid, data):
+        """
+        Manually ends the turn (the timer itself is handled on the server).
+        Ignored without a turn_id (only the server may end whatever turn is
+        running), if the turn_id is stale or if the turn already ended.
+        """
+        turn_id = data.get("turn_id")
+        if turn_id is None:
+            return
+        self.in_room(data.get("roomcode"), self.end_turn, turn_id)
+
+    def on_disconnect(self, sid, reason=None):
+        """
+        Handles player disconnection.
+        The sid index gives the room and player directly; empty rooms are evicted later.
+        """
+        roomcode, username = self.rooms.detach(sid)
+        if roomcode:
+            self.in_room(roomcode, self.forget_sid, username, sid)
+        self.rooms.unwatch(sid)  # The same socket may also have watched a room
+
+    def forget_sid(self, room, username, sid):
+        """Unlinks a dropped socket, unless the player already came back on a new one."""
+        player = room.get_player(username)
+        if player and player.sid == sid:
+            player.sid = None
+        with self.binary_lock:
+            self.binary_clients.get(room.roomcode, set()).discard(sid)
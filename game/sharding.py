@@ -0,0 +1,76 @@
+# Clue & Cue
+# sharding.py
+# ---------------- IMPORTS ---------------- #
+import os
+import string
+
+# ---------------- ROOM CODES ---------------- #
+CODE_ALPHABET = string.ascii_uppercase
+CODE_LENGTH = 4
+CODE_SPACE = len(CODE_ALPHABET) ** CODE_LENGTH  # 26^4 = 456,976 codes
+
+
+def code_to_index(code):
+    """Converts a room code ('ABCD') to its number in the code space (or None if invalid)."""
+    if not isinstance(code, str) or len(code) != CODE_LENGTH:
+        return None
+    index = 0
+    for letter in code:
+        digit = CODE_ALPHABET.find(letter)
+        if digit < 0:
+            return None
+        index = index * len(CODE_ALPHABET) + digit
+    return index
+
+
+def index_to_code(index):
+    """Converts a number in the code space back to its room code."""
+    letters = []
+    for _ in range(CODE_LENGTH):
+        index, digit = divmod(index, len(CODE_ALPHABET))
+        letters.append(CODE_ALPHABET[digit])
+    return "".join(reversed(letters))
+
+
+# ---------------- SHARD MAP CLASS ---------------- #
+class ShardMap:
+    """
+    Splits rooms across worker processes by room code.
+    Worker k owns every code whose index % worker_count == k, so any
+    worker can tell who owns a room without asking anyone.
+    """
+
+    def __init__(self, worker_count=1, worker_index=0, worker_urls=None):
+        self.worker_count = worker_count
+        self.worker_index = worker_index
+        self.worker_urls = worker_urls or []  # Public base URL of each worker, in index order
+
+    @classmethod
+    def from_env(cls):
+        """
+        Reads the cluster layout from the environment (set by cluster.py):
+        CLUE_WORKERS, CLUE_WORKER_INDEX and CLUE_WORKER_URLS (comma separated).
+        """
+        urls = os.environ.get("CLUE_WORKER_URLS", "")
+        return cls(
+            worker_count=int(os.environ.get("CLUE_WORKERS", 1)),
+            worker_index=int(os.environ.get("CLUE_WORKER_INDEX", 0)),
+            worker_urls=[u.rstrip("/") for u in urls.split(",") if u],
+        )
+
+    def owner(self, roomcode):
+        """Returns the index of the worker that owns the room (or None for a bad code)."""
+        index = code_to_index(roomcode)
+        if index is None:
+            return None
+        return index % self.worker_count
+
+    def owns(self, roomcode):
+        return self.owner(roomcode) == self.worker_index
+
+    def owner_url(self, roomcode):
+        """Base URL of the worker that owns the room, if the layout is known."""
+        owner = self.owner(roomcode)
+        if owner is None or owner >= len(self.worker_urls):
+            return None
+        return self.worker_urls[owner]
@@ -0,0 +1,87 @@
+# Clue & Cue
+# timers.py
+# ---------------- IMPORTS ---------------- #
+import math
+import threading
+import time
+
+from .background import BackgroundLoop
+
+
+# ---------------- TIMING WHEEL CLASS ---------------- #
+class TimingWheel(BackgroundLoop):
+    """
+    Hashed timing wheel that owns every turn deadline on the server.
+    A single background loop advances the wheel, so thousands of rooms
+    cost one greenlet/thread instead of one each.
+    Timers are keyed (one per room): scheduling a key again replaces it.
+    """
+
+    def __init__(self, tick=0.1, slots=512):
+        self.tick = tick
+        self.slots = [dict() for _ in range(slots)]
+        self.index = {}  # Key -> slot number, for O(1) cancel
+        self.cursor = 0
+        self.last_tick = time.time()
+        self.lock = threading.Lock()
+        self.running = False
+
+    def __len__(self):
+        return len(self.index)
+
+    def schedule(self, key, deadline, callback, *args):
+        """Fires callback(*args) once at (or just after) the deadline."""
+        with self.lock:
+            self._remove(key)
+            ticks = max(1, math.ceil((deadline - self.last_tick) / self.tick))
+            # advance() moves the cursor before reading a slot, so 'ticks' ahead is slot cursor + ticks
+            rounds, offset = divmod(ticks - 1, len(self.slots))
+            slot = (self.cursor + offset + 1) % len(self.slots)
+            self.slots[slot][key] = [rounds, callback, args]
+            self.index[key] = slot
+
+    def cancel(self, key):
+        """Drops the pending timer for key, if any."""
+        with self.lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        slot = self.index.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def advance(self, now=None):
+        """
+        Moves the wheel forward to 'now' and returns the callbacks that are due.
+        Callbacks are returned (not run) so they can be fired outside the lock.
+        """
+        now = time.time() if now is None else now
+        due = []
+        with self.lock:
+            while self.last_tick + self.tick <= now:
+                self.last_tick += self.tick
+                self.cursor = (self.cursor + 1) % len(self.slots)
+                bucket = self.slots[self.cursor]
+                for key, entry in list(bucket.items()):
+                    if entry[0] > 0:
+                        entry[0] -= 1
+                        continue
+                    del bucket[key]
+                    del self.index[key]
+                    due.append((entry[1], entry[2]))
+        return due
+
+    # --- background loop (see game/background.py) ---
+
+    LOOP_NAME = "TIMER"
+
+    def period(self):
+        return self.tick
+
+    def step(self):
+        """Fires the due callbacks; one that raises doesn't stop the others."""
+        for callback, args in self.advance():
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"[TIMER ERROR] {callback.__name__}{args}: {e}")  # LOG
@@ -0,0 +1,107 @@
+# Clue & Cue
+# wire.py
+# ---------------- IMPORTS ---------------- #
+import struct
+
+# ---------------- COMPACT ENCODING ---------------- #
+# Optional binary format for clients that ask for it in join_game
+# ({"wire": WIRE_VERSION}). Frames are MessagePack, with two changes:
+# - well-known keys are sent as small integers (their position in KEYS),
+# - cards are sent as ids; the names come once per match in 'card_table'
+#   (so round_info carries 'card_id' and its 'card' dict is dropped).
+# templates/game.html gets KEYS from the server, so both sides always agree.
+WIRE_VERSION = "cc1"
+
+KEYS = (
+    "roomcode", "host", "version", "state", "players", "scores", "round_info",
+    "captain_chooser", "clue_giver", "clue_giver_team", "card", "card_id",
+    "turn_deadline", "turn_id", "user", "team", "has_selected", "base", "changes",
+)
+KEY_IDS = {key: i for i, key in enumerate(KEYS)}
+DROPPED_KEYS = frozenset({"card"})  # Replaced by card_id on the binary wire
+
+
+def encode(obj):
+    """Encodes a JSON-like value as a compact binary frame (bytes)."""
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+def _pack(obj, out):
+    if obj is None:
+        out.append(0xc0)
+    elif obj is True:
+        out.append(0xc3)
+    elif obj is False:
+        out.append(0xc2)
+    elif isinstance(obj, int):
+        _pack_int(obj, out)
+    elif isinstance(obj, float):
+        out.append(0xca)
+        out += struct.pack(">f", obj)  # float32 is plenty for timers
+    elif isinstance(obj, str):
+        _pack_str(obj, out)
+    elif isinstance(obj, dict):
+        items = [(k, v) for k, v in obj.items() if k not in DROPPED_KEYS]
+        _pack_header(len(items), 0x80, 0xde, 0xdf, out)
+        for key, value in items:
+            key_id = KEY_IDS.get(key)
+            if key_id is None:
+                _pack_str(str(key), out)
+            else:
+                _pack_int(key_id, out)
+            _pack(value, out)
+    elif isinstance(obj, (list, tuple)):
+        _pack_header(len(obj), 0x90, 0xdc, 0xdd, out)
+        for value in obj:
+            _pack(value, out)
+    else:
+        raise TypeError(f"Can't encode {type(obj).__name__}")
+
+
+def _pack_header(size, fix, head16, head32, out):
+    if size < 16:
+        out.append(fix | size)
+    elif size < 0x10000:
+        out.append(head16)
+        out += struct.pack(">H", size)
+    else:
+        out.append(head32)
+        out += struct.pack(">I", size)
+
+
+def _pack_int(value, out):
+    if 0 <= value < 0x80:
+        out.append(value)
+    elif -32 <= value < 0:
+        out.append(value & 0xff)
+    elif 0 <= value < 0x100:
+        out += b"\xcc" + struct.pack(">B", value)
+    elif 0 <= value < 0x10000:
+        out += b"\xcd" + struct.pack(">H", value)
+    elif 0 <= value < 0x100000000:
+        out += b"\xce" + struct.pack(">I", value)
+    else:
+        out += b"\xd3" + struct.pack(">q", value)
+
+
+def _pack_str(text, out):
+    data = text.encode("utf-8")
+    size = len(data)
+    if size < 32:
+        out.append(0xa0 | size)
+    elif size < 0x100:
+        out += b"\xd9" + struct.pack(">B", size)
+    elif size < 0x10000:
+        out += b"\xda" + struct.pack(">H", size)
+    else:
+        out += b"\xdb" + struct.pack(">I", size)
+    out += data
+
+
+# ---------------- CARD TABLES ---------------- #
+
+def card_table(catalog, card_ids):
+    """[[id, name, type], ...] for the cards a binary client will see by id."""
+    return [[card_id, catalog.name(card_id), catalog.type_name(card_id)] for card_id in card_ids]
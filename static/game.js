@@ -0,0 +1,432 @@
+// Clue & Cue - Game page (templates/game.html)
+
+const socket = io({ autoConnect: false });
+
+// The page is the same for every room (and cached), so the code comes from the URL
+const roomcode = decodeURIComponent(window.location.pathname.split("/").pop());
+document.getElementById("room-code").innerText = roomcode;
+
+// Compact binary wire (game/wire.py): MessagePack frames with numbered keys;
+// WIRE_VERSION and WIRE_KEYS are set by the page
+const useBinaryWire = typeof TextDecoder !== "undefined" && typeof DataView !== "undefined";
+let cardTable = {};  // Card id -> {name, type}, filled by card_table / deal_hand
+
+function decodeFrame(buffer) {
+    const bytes = new Uint8Array(buffer);
+    const view = new DataView(buffer);
+    const text = new TextDecoder();
+    let pos = 0;
+    const str = (n) => { const s = text.decode(bytes.subarray(pos, pos + n)); pos += n; return s; };
+    const arr = (n) => { const a = []; for (let i = 0; i < n; i++) a.push(read()); return a; };
+    const map = (n) => {
+        const o = {};
+        for (let i = 0; i < n; i++) {
+            const k = read();
+            o[typeof k === "number" ? WIRE_KEYS[k] : k] = read();
+        }
+        return o;
+    };
+    const u16 = () => { const v = view.getUint16(pos); pos += 2; return v; };
+    const u32 = () => { const v = view.getUint32(pos); pos += 4; return v; };
+    function read() {
+        const b = bytes[pos++];
+        if (b < 0x80) return b;
+        if (b >= 0xe0) return b - 0x100;
+        if ((b & 0xf0) === 0x80) return map(b & 0x0f);
+        if ((b & 0xf0) === 0x90) return arr(b & 0x0f);
+        if ((b & 0xe0) === 0xa0) return str(b & 0x1f);
+        let v;
+        switch (b) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xca: v = view.getFloat32(pos); pos += 4; return v;
+            case 0xcc: return bytes[pos++];
+            case 0xcd: return u16();
+            case 0xce: return u32();
+            case 0xd3: v = Number(view.getBigInt64(pos)); pos += 8; return v;
+            case 0xd9: return str(bytes[pos++]);
+            case 0xda: return str(u16());
+            case 0xdb: return str(u32());
+            case 0xdc: return arr(u16());
+            case 0xdd: return arr(u32());
+            case 0xde: return map(u16());
+            case 0xdf: return map(u32());
+        }
+        throw new Error("Unknown wire byte " + b);
+    }
+    return read();
+}
+
+// Payloads are plain JSON unless this client negotiated the binary wire
+function fromWire(payload) {
+    return payload instanceof ArrayBuffer ? decodeFrame(payload) : payload;
+}
+
+// Binary frames carry card ids only; look the names up
+function attachCard(state) {
+    const info = state.round_info;
+    if (info && !("card" in info)) {
+        info.card = info.card_id === null || info.card_id === undefined ? null : (cardTable[info.card_id] || null);
+    }
+}
+
+socket.on("card_table", (payload) => {
+    fromWire(payload).forEach(([id, name, type]) => { cardTable[id] = {name: name, type: type}; });
+});
+
+const params = new URLSearchParams(window.location.search);
+let username = params.get("username");
+// ?watch=1 joins as a spectator: no name, no hand, no card, throttled snapshots
+const spectating = params.get("watch") === "1";
+if (spectating) username = null;
+
+if (!spectating && (!username || username === 'null' || username === 'undefined')) {
+    username = prompt("Enter your username:");
+    if (!username) {
+        window.location.href = window.location.origin;
+    }
+}
+
+if (username) {
+    document.getElementById("my-username").innerText = username;
+} else if (spectating) {
+    document.getElementById("my-username").innerText = "Spectator";
+}
+
+document.getElementById('btn-start-connection').addEventListener('click', () => {
+    document.getElementById('ghost-prevention-overlay').style.display = 'none';
+    socket.connect();
+});
+
+// Session token for this room and name: sent back on reconnect, so the
+// server only catches this tab up instead of telling the whole room
+const sessionKey = `clue-session:${roomcode}:${username}`;
+
+socket.on('connect', () => {
+    console.log("Connected to server!");
+    if (spectating && roomcode) {
+        socket.emit("watch_game", {roomcode: roomcode});
+    } else if (username && roomcode) {
+        const join = {roomcode: roomcode, username: username};
+        if (useBinaryWire) join.wire = WIRE_VERSION;
+        const token = sessionStorage.getItem(sessionKey);
+        if (token) join.token = token;
+        socket.emit("join_game", join);
+    }
+    clockBurst = CLOCK_BURST;
+    pingClock();
+});
+
+// NTP-style clock sync: offset = server - (t0 + t3) / 2, taken from the
+// sample with the shortest round trip among the last few. A burst on
+// connect, then one ping every CLOCK_REPING_MS to follow drift.
+const CLOCK_BURST = 5;
+const CLOCK_REPING_MS = 30000;
+let clockOffset = 0;  // Add to Date.now() to get server time (ms)
+let clockSamples = [];
+let clockBurst = 0;
+
+function pingClock() { socket.emit("clock_ping", {t0: Date.now()}); }
+function serverNow() { return Date.now() + clockOffset; }
+
+socket.on("clock_pong", (data) => {
+    const t3 = Date.now();
+    clockSamples.push({rtt: t3 - data.t0, offset: data.server - (data.t0 + t3) / 2});
+    if (clockSamples.length > 8) clockSamples.shift();
+    clockOffset = clockSamples.reduce((best, s) => s.rtt < best.rtt ? s : best).offset;
+    if (--clockBurst > 0) pingClock();
+});
+setInterval(() => { if (socket.connected) pingClock(); }, CLOCK_REPING_MS);
+
+socket.on("session", (data) => {
+    sessionStorage.setItem(sessionKey, data.token);
+});
+
+let myTeam = null;
+let timerInterval = null;
+let currentTurnId = null;
+let roomState = null;  // Last full state, kept current by patches
+let resyncPending = false;
+
+// Full snapshot (on join, or after falling behind)
+socket.on("state_update", (payload) => {
+    const state = fromWire(payload);
+    attachCard(state);
+    roomState = state;
+    resyncPending = false;
+    renderState(state);
+});
+
+// Versioned patch with only the fields that changed
+socket.on("state_patch", (payload) => {
+    const patch = fromWire(payload);
+    if (!roomState) return;  // Still waiting for the first snapshot
+    if (patch.base !== roomState.version) {
+        if (!resyncPending) {
+            resyncPending = true;
+            socket.emit("request_state", {roomcode: roomcode});
+        }
+        return;
+    }
+    Object.assign(roomState, patch.changes);
+    roomState.version = patch.version;
+    attachCard(roomState);
+    renderState(roomState);
+});
+
+function renderState(state) {
+    console.log("State:", state);
+    renderLobby(state.players, state.host);
+
+    const me = state.players.find(p => p.user === username);
+    if(me) myTeam = me.team;
+
+    renderTeamLists(state.players);
+    updateScores(state.scores);
+
+    document.querySelectorAll('.game-phase').forEach(el => el.classList.add('hidden'));
+
+    if(state.state === "LOBBY") {
+        document.getElementById("view-lobby").classList.remove("hidden");
+        // HOST LOGIC
+        if (state.host === username) {
+            document.getElementById("host-controls").classList.remove("hidden");
+            document.getElementById("msg-waiting-host").classList.add("hidden");
+        } else {
+            document.getElementById("host-controls").classList.add("hidden");
+            document.getElementById("msg-waiting-host").classList.remove("hidden");
+        }
+    }
+    else if(state.state === "SELECTION") {
+        document.getElementById("view-selection").classList.remove("hidden");
+    }
+    else if(state.state.includes("ROUND")) {
+        document.getElementById("view-game").classList.remove("hidden");
+        document.getElementById("round-title").innerText = state.state.replace("_", " ");
+        handleGameLogic(state);
+    }
+    else if(state.state === "FINISHED") {
+        document.getElementById("view-finished").classList.remove("hidden");
+        handleGameOver(state);
+    }
+}
+
+function handleGameLogic(state) {
+    const info = state.round_info;
+    currentTurnId = info.turn_id;
+    const containerChooser = document.getElementById("container-chooser");
+    const containerGiver = document.getElementById("container-giver");
+    const containerWatcher = document.getElementById("container-watcher");
+    const timerDisplay = document.getElementById("timer-display");
+
+    containerChooser.classList.add("hidden");
+    containerGiver.classList.add("hidden");
+    containerWatcher.classList.add("hidden");
+    timerDisplay.classList.add("hidden");
+
+    // Clear old timer
+    if(timerInterval) clearInterval(timerInterval);
+
+    // 1. Captain Phase (Choosing who gives clues)
+    if (info.captain_chooser === username && !info.clue_giver) {
+        containerChooser.classList.remove("hidden");
+        renderTeammatesForCaptain(state.players);
+    }
+    // 2. Clue Giver Phase (Timer Active)
+    else if (info.clue_giver === username) {
+        containerGiver.classList.remove("hidden");
+
+        // Logic to hide skip button in Round 1
+        const skipBtn = document.querySelector('.btn-skip');
+        if (state.state === 'ROUND_1') {
+            skipBtn.classList.add('hidden');
+        } else {
+            skipBtn.classList.remove('hidden');
+        }
+
+        // The server ends the turn when time runs out
+        startTimer(state.turn_deadline);
+
+        if(info.card) {
+            document.getElementById("card-display").innerText = info.card.name;
+            document.getElementById("card-type").innerText = info.card.type;
+        }
+    }
+    // 3. Watcher Phase (Timer Active)
+    else if (info.clue_giver) {
+        containerWatcher.classList.remove("hidden");
+
+        // Watchers just see the timer, they don't trigger the action
+        startTimer(state.turn_deadline);
+
+        document.getElementById("watcher-headline").innerText = `${info.clue_giver} is giving clues!`;
+
+        const subtext = document.getElementById("watcher-subtext");
+        if (spectating) {
+            subtext.innerText = "Spectating 👀";
+            subtext.style.color = "#95a5a6";
+        } else if (myTeam === info.clue_giver_team) {
+            subtext.innerText = "GUESS THE WORD! 🗣️";
+            subtext.style.color = "#2ecc71"; // Green
+        } else {
+            subtext.innerText = "Shhh! Stay silent. 🤫";
+            subtext.style.color = "#95a5a6"; // Gray
+        }
+    }
+}
+
+// Counts down to the turn's absolute deadline (server ms), so every
+// client shows the same second whatever its latency or local clock
+function startTimer(deadline, onComplete) {
+    const display = document.getElementById("timer-display");
+    display.classList.remove("hidden");
+
+    if (deadline === undefined || deadline === null || deadline <= serverNow()) {
+        display.innerText = "0";
+        return;
+    }
+
+    const tick = () => {
+        const diff = Math.ceil((deadline - serverNow()) / 1000);
+
+        if(diff <= 0) {
+            display.innerText = "TIME'S UP!";
+            clearInterval(timerInterval);
+            if (onComplete) onComplete();
+        } else {
+            display.innerText = diff;
+        }
+    };
+    tick();
+    timerInterval = setInterval(tick, 250);
+}
+
+function renderLobby(players, host) {
+    const list = document.getElementById("player-list");
+    list.innerHTML = "";
+    players.forEach(p => {
+        const isHost = p.user === host ? " (HOST)" : "";
+        const isReady = p.has_selected ? " ✅" : "";
+        const li = document.createElement("li");
+        li.innerText = `${p.user}${isHost}${isReady}`;
+        list.appendChild(li);
+    });
+}
+
+function renderTeamLists(players) {
+    const t1 = document.getElementById("list-team-1");
+    const t2 = document.getElementById("list-team-2");
+    t1.innerHTML = ""; t2.innerHTML = "";
+    players.forEach(p => {
+        const li = document.createElement("li");
+        li.innerText = p.user;
+        if(p.team === 1) t1.appendChild(li);
+        else if(p.team === 2) t2.appendChild(li);
+    });
+}
+
+function updateScores(scores) {
+    document.getElementById("score-1").innerText = scores["1"];
+    document.getElementById("score-2").innerText = scores["2"];
+}
+
+function renderTeammatesForCaptain(players) {
+    const buttonsDiv = document.getElementById("teammate-buttons");
+    buttonsDiv.innerHTML = "";
+    players.forEach(p => {
+        if(p.team === myTeam) {
+            const btn = document.createElement("button");
+            btn.innerText = p.user;
+            btn.onclick = () => socket.emit("select_giver", {roomcode: roomcode, target_user: p.user});
+            buttonsDiv.appendChild(btn);
+        }
+    });
+}
+
+function handleGameOver(state) {
+    const s1 = state.scores["1"];
+    const s2 = state.scores["2"];
+    document.getElementById("final-score-1").innerText = s1;
+    document.getElementById("final-score-2").innerText = s2;
+    const res = document.getElementById("final-result");
+
+    if (s1 > s2) res.innerHTML = "<h2 style='color:#ff6b6b'>TEAM 1 WINS! 🏆</h2>";
+    else if (s2 > s1) res.innerHTML = "<h2 style='color:#4ecdc4'>TEAM 2 WINS! 🏆</h2>";
+    else res.innerHTML = "<h2>IT'S A TIE!</h2>";
+}
+
+// Selection
+let selectedIndices = new Set();
+socket.on("deal_hand", (payload) => {
+    let cards = fromWire(payload);
+    if (payload instanceof ArrayBuffer) {
+        // [[id, name, type], ...] on the binary wire
+        cards = cards.map(([id, name, type]) => (cardTable[id] = {name: name, type: type}));
+    }
+    const container = document.getElementById("hand-container");
+    container.innerHTML = "";
+    cards.forEach((card, index) => {
+        const div = document.createElement("div");
+        div.className = "card-select";
+        div.innerHTML = `<div>${card.name}</div><div style='font-size:0.8em; opacity:0.6'>${card.type}</div>`;
+        div.onclick = () => {
+            if(selectedIndices.has(index)) {
+                selectedIndices.delete(index);
+                div.classList.remove("selected");
+            } else if(selectedIndices.size < 5) {
+                selectedIndices.add(index);
+                div.classList.add("selected");
+            }
+        };
+        container.appendChild(div);
+    });
+});
+
+document.getElementById("btn-start-game").onclick = () => {
+     // We need to send username so server checks if we are host
+     socket.emit("start_game", {roomcode: roomcode, username: username});
+};
+
+// Host only: search the room's cards (accents don't matter) and leave some out of the deal
+let searchTimer = null;
+document.getElementById("card-search").oninput = (e) => {
+    clearTimeout(searchTimer);
+    const query = e.target.value.trim();
+    searchTimer = setTimeout(() => {
+        if (!query) { renderSearchResults([]); return; }
+        fetch(`/search?room=${encodeURIComponent(roomcode)}&limit=8&q=${encodeURIComponent(query)}`)
+            .then(res => res.json())
+            .then(data => renderSearchResults(data.results));
+    }, 150);
+};
+
+function renderSearchResults(results) {
+    const list = document.getElementById("card-search-results");
+    list.innerHTML = "";
+    results.forEach(card => {
+        const li = document.createElement("li");
+        li.innerText = `${card.name} (${card.type}) `;
+        const btn = document.createElement("button");
+        btn.innerText = card.excluded ? "Left out" : "Leave out";
+        btn.disabled = card.excluded;
+        btn.onclick = () => {
+            socket.emit("exclude_cards", {roomcode: roomcode, username: username, card_ids: [card.id]});
+            btn.innerText = "Left out";
+            btn.disabled = true;
+        };
+        li.appendChild(btn);
+        list.appendChild(li);
+    });
+}
+
+document.getElementById("btn-submit-hand").onclick = () => {
+    if(selectedIndices.size !== 5) { alert("Select 5 cards!"); return; }
+    socket.emit("submit_cards", {roomcode: roomcode, username: username, indices: Array.from(selectedIndices)});
+    document.getElementById("btn-submit-hand").classList.add("hidden");
+    document.getElementById("waiting-msg").classList.remove("hidden");
+};
+
+function sendAction(action) { socket.emit(action, {roomcode: roomcode}); }
+function sendEndTurn() { socket.emit("end_turn", {roomcode: roomcode, turn_id: currentTurnId}); }
+socket.on("error", (d) => alert(d.msg));
@@ -0,0 +1,46 @@
+// Clue & Cue - Home page (templates/index.html)
+
+const socket = io();
+
+function createRoom() {
+    const username = document.getElementById("create-username").value.trim();
+    if(!username) { alert("Please enter a username!"); return; }
+    const packs = Array.from(document.querySelectorAll("#pack-list input:checked")).map(el => el.value);
+    socket.emit("create_room", {username: username, packs: packs});
+}
+
+// Extra deck packs offered by the server, played on top of the usual cards
+socket.on("connect", () => socket.emit("list_packs", {}));
+
+socket.on("packs", (data) => {
+    const list = document.getElementById("pack-list");
+    list.innerHTML = "";
+    data.packs.forEach(pack => {
+        const label = document.createElement("label");
+        const box = document.createElement("input");
+        box.type = "checkbox";
+        box.value = pack.name;
+        label.appendChild(box);
+        label.appendChild(document.createTextNode(` ${pack.name} (${pack.cards} cards)`));
+        list.appendChild(label);
+    });
+    list.classList.toggle("hidden", data.packs.length === 0);
+});
+
+// The server is still building the deck for these packs: ask again in a moment
+socket.on("packs_pending", () => setTimeout(createRoom, 1000));
+
+socket.on("room_created", (data) => {
+    const username = document.getElementById("create-username").value.trim();
+    window.location.href = `/game/${data.roomcode}?username=${encodeURIComponent(username)}`;
+});
+
+function joinRoom() {
+    const username = document.getElementById("join-username").value.trim();
+    const code = document.getElementById("room-code-input").value.trim().toUpperCase();
+
+    if(!username || !code) { alert("Please enter both username and room code!"); return; }
+    window.location.href = `/game/${code}?username=${encodeURIComponent(username)}`;
+}
+
+socket.on("error", (d) => alert(d.msg));
@@ -0,0 +1,200 @@
+# Clue & Cue
+# bench_engine.py
+"""
+Microbenchmarks for game.engine (no Flask, no sockets).
+
+Every case runs with a fixed seed and reports ns/op plus tracemalloc numbers
+(blocks still allocated per op, and peak bytes per op). Results are compared
+against tools/bench_baseline.json; a case slower than the baseline by more
+than --threshold fails the run (exit code 1).
+
+    python tools/bench_engine.py                  # compare with the baseline
+    python tools/bench_engine.py --save-baseline  # record new numbers
+"""
+# ---------------- IMPORTS ---------------- #
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from game.analytics import CardStats  # noqa: E402
+from game.engine import Room  # noqa: E402
+
+BASELINE_PATH = os.path.join(ROOT, "tools", "bench_baseline.json")
+SEED = 1234
+
+
+# ---------------- ROOM SETUPS ---------------- #
+
+def lobby(players):
+    room = Room("BNCH", "p0")
+    for i in range(1, players):
+        room.add_player(f"p{i}")
+    return room
+
+
+def dealt(players):
+    room = lobby(players)
+    room.start_selection_phase()
+    return room
+
+
+def all_but_one_submitted(players):
+    room = dealt(players)
+    for p in room.players[1:]:
+        room.submit_selection(p.user, [0, 1, 2, 3, 4])
+    return room
+
+
+def in_turn(players, state):
+    """A room in the middle of a turn, in the given round."""
+    room = all_but_one_submitted(players)
+    room.submit_selection(room.players[0].user, [0, 1, 2, 3, 4])
+    room.game_state = state
+    room.set_clue_giver(room.current_captain_chooser.user)
+    room.turn_end_timestamp = time.time() + 3600  # Never runs out during the benchmark
+    return room
+
+
+def patched(room):
+    """A room whose pending changes were already sent, as between two taps of a turn."""
+    room.get_state_patch()
+    return room
+
+
+def with_card_stats(room):
+    room.analytics = CardStats(room.catalog)
+    return room
+
+
+def play_actions(room, count):
+    """count random taps of the clue giver; a new turn starts whenever one ends."""
+    actions = (room.guess_correct, room.skip_card, room.taboo_guess, room.skip_card)
+    for i in range(count):
+        if not room.current_clue_giver:
+            if room.game_state == "FINISHED":
+                return
+            room.set_clue_giver(room.current_captain_chooser.user)
+            room.turn_end_timestamp = time.time() + 3600
+        if i % 16 == 15:
+            room.end_turn()
+        else:
+            actions[i % 4]()
+
+
+# ---------------- CASES ---------------- #
+# name -> (setup, operation, operations counted per call)
+CASES = {
+    "start_selection_phase[4]": (lambda: lobby(4), lambda r: r.start_selection_phase(), 1),
+    "start_selection_phase[12]": (lambda: lobby(12), lambda r: r.start_selection_phase(), 1),
+    "start_selection_phase[40]": (lambda: lobby(40), lambda r: r.start_selection_phase(), 1),
+    "submit_selection[12]": (lambda: dealt(12), lambda r: r.submit_selection("p0", [0, 1, 2, 3, 4]), 1),
+    "submit_selection+compile_match_deck[40]": (
+        lambda: all_but_one_submitted(40), lambda r: r.submit_selection(r.players[0].user, [0, 1, 2, 3, 4]), 1),
+    "compile_match_deck[40]": (lambda: all_but_one_submitted(40), lambda r: r.compile_match_deck(), 1),
+    "turn_actions[12]": (lambda: in_turn(12, "ROUND_2"), lambda r: play_actions(r, 200), 200),
+    "turn_actions[40]": (lambda: in_turn(40, "ROUND_2"), lambda r: play_actions(r, 200), 200),
+    "turn_actions+card_stats[12]": (
+        lambda: with_card_stats(in_turn(12, "ROUND_2")), lambda r: play_actions(r, 200), 200),
+    "get_public_state[12]": (lambda: in_turn(12, "ROUND_2"), lambda r: json.dumps(r.get_public_state()), 1),
+    "get_public_state[40]": (lambda: in_turn(40, "ROUND_2"), lambda r: json.dumps(r.get_public_state()), 1),
+    "guess+get_state_patch[40]": (
+        lambda: patched(in_turn(40, "ROUND_2")), lambda r: (r.guess_correct(), json.dumps(r.get_state_patch())), 1),
+}
+
+
+# ---------------- RUNNER ---------------- #
+
+def measure(setup, operation, ops_per_call, repeat):
+    """Times 'repeat' calls (setup excluded), then one traced call for allocations."""
+    random.seed(SEED)
+    total_ns = 0
+    for _ in range(repeat):
+        ctx = setup()
+        start = time.perf_counter_ns()
+        operation(ctx)
+        total_ns += time.perf_counter_ns() - start
+
+    random.seed(SEED)
+    ctx = setup()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    operation(ctx)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+
+    ops = repeat * ops_per_call
+    return {
+        "ns_per_op": round(total_ns / ops, 1),
+        "blocks_per_op": round(blocks / ops_per_call, 2),
+        "peak_bytes_per_op": round((peak - base) / ops_per_call, 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Returns the names of cases slower than baseline * (1 + threshold)."""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        ratio = result["ns_per_op"] / old["ns_per_op"]
+        result["vs_baseline"] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark game.engine hot paths.")
+    parser.add_argument("--repeat", type=int, default=200, help="Calls per case")
+    parser.add_argument("--filter", default="", help="Only run cases containing this text")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, (setup, operation, ops_per_call) in CASES.items():
+        if args.filter in name:
+            results[name] = measure(setup, operation, ops_per_call, args.repeat)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved {len(results)} cases to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'case':42} {'ns/op':>12} {'blocks/op':>10} {'peak B/op':>11} {'vs base':>8}")
+        for name, r in results.items():
+            print(f"{name:42} {r['ns_per_op']:>12.1f} {r['blocks_per_op']:>10.2f} "
+                  f"{r['peak_bytes_per_op']:>11.1f} {r.get('vs_baseline', '-'):>8}")
+    if regressions:
+        print(f"REGRESSION (> {args.threshold:.0%} slower): {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
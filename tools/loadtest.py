@@ -0,0 +1,316 @@
+# Clue & Cue
+# loadtest.py
+"""
+Load generator: plays full games over real Socket.IO connections.
+
+Starts app.py locally (or targets --url), then for every stage of
+--rooms x --players runs that many simulated rooms through
+create_room -> join_game -> start_game -> submit_cards -> select_giver ->
+bursts of action_guess / action_skip / action_taboo -> end_turn ... FINISHED.
+
+Reports throughput, p50/p95/p99 latency from an event to the state message
+it causes, and server memory per room, as JSON (compare runs between releases):
+
+    python tools/loadtest.py --rooms 10,50 --players 4,8 --output run.json
+    python tools/loadtest.py --asgi ...   # asgi_app.py under uvicorn instead of app.py
+"""
+# ---------------- IMPORTS ---------------- #
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPLY_TIMEOUT = 5  # Seconds to wait for the state message caused by an event
+
+
+# ---------------- SIMULATED CLIENT ---------------- #
+class SimClient:
+    """One browser tab: keeps the room state current from snapshots and patches."""
+
+    def __init__(self, url, username, stats):
+        self.username = username
+        self.stats = stats
+        self.state = None
+        self.hand = None
+        self.roomcode = None
+        self.changed = threading.Condition()
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on("room_created", self._on_room_created)
+        self.sio.on("state_update", self._on_state_update)
+        self.sio.on("state_patch", self._on_state_patch)
+        self.sio.on("deal_hand", self._on_deal_hand)
+        self.sio.connect(url, transports=["websocket"])
+
+    def _notify(self):
+        with self.changed:
+            self.changed.notify_all()
+
+    def _on_room_created(self, data):
+        self.roomcode = data["roomcode"]
+        self._notify()
+
+    def _on_state_update(self, state):
+        self.state = state
+        self._notify()
+
+    def _on_state_patch(self, patch):
+        if self.state is None:
+            return
+        if patch["base"] != self.state["version"]:
+            self.sio.emit("request_state", {"roomcode": self.roomcode})
+            return
+        self.state.update(patch["changes"])
+        self.state["version"] = patch["version"]
+        self._notify()
+
+    def _on_deal_hand(self, cards):
+        self.hand = cards
+        self._notify()
+
+    def wait_for(self, check, timeout=REPLY_TIMEOUT):
+        with self.changed:
+            return self.changed.wait_for(check, timeout)
+
+    def version(self):
+        return self.state["version"] if self.state else -1
+
+    def send(self, event, data):
+        """Emits an event and times it until this client sees the next state version."""
+        before = self.version()
+        start = time.perf_counter()
+        self.sio.emit(event, data)
+        if self.wait_for(lambda: self.version() > before):
+            self.stats.record(event, time.perf_counter() - start)
+            return True
+        self.stats.record_timeout(event)
+        return False
+
+    def close(self):
+        self.sio.disconnect()
+
+
+# ---------------- STATS ---------------- #
+class Stats:
+    """Latencies per event type, shared by every room thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.timeouts = {}
+        self.games_finished = 0
+        self.errors = 0
+
+    def record(self, event, seconds):
+        with self.lock:
+            self.latencies.setdefault(event, []).append(seconds)
+
+    def record_timeout(self, event):
+        with self.lock:
+            self.timeouts[event] = self.timeouts.get(event, 0) + 1
+
+    def summary(self, elapsed):
+        everything = sorted(v for values in self.latencies.values() for v in values)
+        return {
+            "events": len(everything),
+            "events_per_second": len(everything) / elapsed if elapsed else 0.0,
+            "games_finished": self.games_finished,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "latency_ms": percentiles(everything),
+            "latency_ms_by_event": {e: percentiles(sorted(v)) for e, v in sorted(self.latencies.items())},
+        }
+
+
+def percentiles(values):
+    if not values:
+        return {}
+
+    def at(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 3)
+
+    return {"p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "max": round(values[-1] * 1000, 3)}
+
+
+# ---------------- ONE SIMULATED ROOM ---------------- #
+
+def play_room(url, players, stats, rng, burst):
+    """Plays a whole game with 'players' clients. Returns True if it reached FINISHED."""
+    prefix = f"bot{rng.randrange(10 ** 8)}_"
+    clients = [SimClient(url, f"{prefix}{i}", stats) for i in range(players)]
+    by_name = {c.username: c for c in clients}
+    try:
+        host = clients[0]
+        host.sio.emit("create_room", {"username": host.username})
+        if not host.wait_for(lambda: host.roomcode):
+            return False
+        roomcode = host.roomcode
+
+        for c in clients:
+            c.roomcode = roomcode
+            start = time.perf_counter()
+            c.sio.emit("join_game", {"roomcode": roomcode, "username": c.username})
+            if c.wait_for(lambda: c.state is not None):
+                stats.record("join_game", time.perf_counter() - start)
+
+        host.send("start_game", {"roomcode": roomcode, "username": host.username})
+        for c in clients:
+            c.wait_for(lambda: c.hand is not None)
+            c.send("submit_cards", {"roomcode": roomcode, "username": c.username, "indices": [0, 1, 2, 3, 4]})
+
+        # Rounds: each captain picks themselves, then taps through a burst of cards
+        while host.wait_for(lambda: host.state["state"] != "SELECTION") and host.state["state"].startswith("ROUND"):
+            info = host.state["round_info"]
+            captain = by_name[info["captain_chooser"]]
+            if not captain.send("select_giver", {"roomcode": roomcode, "target_user": captain.username}):
+                break
+            for _ in range(rng.randint(1, burst)):
+                state = captain.state
+                if not state["state"].startswith("ROUND") or not state["round_info"]["clue_giver"]:
+                    break
+                actions = ["action_guess", "action_guess", "action_taboo"]
+                if state["state"] != "ROUND_1":
+                    actions.append("action_skip")
+                captain.send(rng.choice(actions), {"roomcode": roomcode})
+            if captain.state["round_info"]["clue_giver"]:
+                turn_id = captain.state["round_info"]["turn_id"]
+                captain.send("end_turn", {"roomcode": roomcode, "turn_id": turn_id})
+            host.wait_for(lambda: host.version() >= captain.version())
+
+        return host.state["state"] == "FINISHED"
+    finally:
+        for c in clients:
+            c.close()
+
+
+# ---------------- SERVER ---------------- #
+
+def start_server(port, asgi=False):
+    """Runs app.py (or asgi_app.py) on a free local port and waits until it accepts connections."""
+    env = dict(os.environ, PORT=str(port), FLASK_DEBUG="0")
+    if asgi:
+        command = [sys.executable, "-m", "uvicorn", "asgi_app:app", "--port", str(port), "--log-level", "warning"]
+    else:
+        command = [sys.executable, os.path.join(ROOT, "app.py")]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Server did not start.")
+
+
+def server_rss(pid):
+    """Resident memory of the server process in bytes (Linux only)."""
+    if not pid:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ---------------- STAGES ---------------- #
+
+def run_stage(url, pid, rooms, players, ramp, burst, seed):
+    """Starts 'rooms' games spread over 'ramp' seconds and waits for all of them."""
+    stats = Stats()
+    rss_before = server_rss(pid)
+
+    def worker(index):
+        try:
+            if play_room(url, players, stats, random.Random(seed * 100003 + index), burst):
+                with stats.lock:
+                    stats.games_finished += 1
+        except Exception as e:
+            print(f"[LOADTEST] Room {index} failed: {e}", file=sys.stderr)  # LOG
+            with stats.lock:
+                stats.errors += 1
+
+    threads = []
+    start = time.perf_counter()
+    for i in range(rooms):
+        t = threading.Thread(target=worker, args=(i,), daemon=True)
+        t.start()
+        threads.append(t)
+        if ramp:
+            time.sleep(ramp / rooms)
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    result = {"rooms": rooms, "players_per_room": players, "seconds": round(elapsed, 3)}
+    result.update(stats.summary(elapsed))
+    rss_after = server_rss(pid)
+    if rss_before is not None and rss_after is not None:
+        result["server_rss_bytes"] = rss_after
+        result["memory_per_room_bytes"] = max(0, rss_after - rss_before) // rooms
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate full Clue & Cue games over Socket.IO.")
+    parser.add_argument("--url", help="Target an already running server instead of starting app.py")
+    parser.add_argument("--server-pid", type=int, help="Pid of the --url server, to report its memory")
+    parser.add_argument("--asgi", action="store_true", help="Start asgi_app.py under uvicorn instead of app.py")
+    parser.add_argument("--rooms", default="10", help="Comma separated room counts, one stage each")
+    parser.add_argument("--players", default="4", help="Comma separated players per room")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which rooms are started")
+    parser.add_argument("--burst", type=int, default=6, help="Max actions per turn")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    server = None
+    url, pid = args.url, args.server_pid
+    if not url:
+        port = free_port()
+        server = start_server(port, args.asgi)
+        url, pid = f"http://127.0.0.1:{port}", server.pid
+
+    try:
+        stages = []
+        for rooms in (int(r) for r in args.rooms.split(",")):
+            for players in (int(p) for p in args.players.split(",")):
+                stage = run_stage(url, pid, rooms, players, args.ramp, args.burst, args.seed)
+                print(f"[LOADTEST] {rooms} rooms x {players} players: "
+                      f"{stage['events_per_second']:.0f} events/s, p95 {stage['latency_ms'].get('p95')} ms",
+                      file=sys.stderr)  # LOG
+                stages.append(stage)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    report = {"url": url, "started_server": server is not None, "asgi": args.asgi, "time": time.time(), "stages": stages}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
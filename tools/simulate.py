@@ -0,0 +1,317 @@
+# Clue & Cue
+# simulate.py
+"""
+Headless game simulator for tuning the rules offline.
+
+Plays whole matches on game.engine.Room directly (no Flask, no sockets, no
+real time: each room gets a simulated clock) with synthetic players whose
+guess times depend on the round and the card type. Matches are spread over a
+process pool, every match has its own seed, so a run is reproducible.
+
+Reports final score distributions, turns per round and how long each round
+takes until its deck runs out (simulated seconds), as JSON:
+
+    python tools/simulate.py --matches 200000 --players 6 --turn-seconds 30,45
+    python tools/simulate.py --model expert --hand-size 10 --keep-size 6
+    python tools/simulate.py --model mypackage.models:Slowpokes --type-factor Filme=1.4
+
+A model is any object with the methods of PlayerModel (see MODELS).
+"""
+# ---------------- IMPORTS ---------------- #
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import importlib
+import json
+import math
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from game.engine import Room, Rules, DEFAULT_RULES  # noqa: E402
+
+MAX_TURNS = 2000  # Per match, in case a model never gets through the deck
+EXHAUSTION_BUCKET = 5  # Seconds; round durations are counted in buckets this wide
+
+
+# ---------------- PLAYER MODELS ---------------- #
+class PlayerModel:
+    """
+    A synthetic team: how long they take on a card and what the clue giver does.
+    Guess times are log-normal around mean_seconds[round - 1], scaled per card
+    type by type_factor. Rounds 2 and 3 may skip a card (after half the time),
+    any round may burn one with an illegal clue.
+    """
+
+    def __init__(self, mean_seconds=(8.0, 5.0, 7.0), sigma=0.6, skip_rate=(0.0, 0.10, 0.15),
+                 taboo_rate=0.04, type_factor=None):
+        self.mean_seconds = mean_seconds
+        self.sigma = sigma
+        self.skip_rate = skip_rate
+        self.taboo_rate = taboo_rate
+        self.type_factor = dict(type_factor or {})
+
+    def choose(self, rng, hand, keep_size):
+        """Indices of the cards kept from the dealt hand ([(name, type), ...])."""
+        return rng.sample(range(len(hand)), keep_size)
+
+    def action(self, rng, round_number, card_type):
+        """'guess', 'skip' or 'taboo' for the card in play."""
+        roll = rng.random()
+        if roll < self.taboo_rate:
+            return "taboo"
+        if roll < self.taboo_rate + self.skip_rate[round_number - 1]:
+            return "skip"
+        return "guess"
+
+    def seconds(self, rng, round_number, card_type, action):
+        """Time spent on the card before the action."""
+        mean = self.mean_seconds[round_number - 1] * self.type_factor.get(card_type, 1.0)
+        # Log-normal with the given mean: mu = ln(mean) - sigma^2 / 2
+        spent = rng.lognormvariate(math.log(mean) - self.sigma ** 2 / 2, self.sigma)
+        return spent / 2 if action == "skip" else spent
+
+
+# Name -> model, for --model
+MODELS = {
+    "casual": PlayerModel(),
+    "expert": PlayerModel(mean_seconds=(5.0, 3.0, 4.5), sigma=0.5, taboo_rate=0.02),
+    "beginner": PlayerModel(mean_seconds=(12.0, 8.0, 10.0), sigma=0.8, skip_rate=(0.0, 0.2, 0.25), taboo_rate=0.08),
+}
+
+
+def load_model(spec, type_factor=None):
+    """A preset from MODELS, or 'module:attribute' (a model, or a class to instantiate)."""
+    if spec in MODELS:
+        model = MODELS[spec]
+    else:
+        module_name, _, attribute = spec.partition(":")
+        model = getattr(importlib.import_module(module_name), attribute)
+        if isinstance(model, type):
+            model = model()
+    if type_factor:
+        model.type_factor = dict(getattr(model, "type_factor", {}), **type_factor)
+    return model
+
+
+# ---------------- ONE MATCH ---------------- #
+class SimClock:
+    """Stands in for time.time in a simulated room."""
+
+    __slots__ = ("now",)
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def play_match(seed, players, rules, model):
+    """
+    Plays one match to FINISHED. Returns (team one score, team two score,
+    turns per round, seconds per round), or None if it hit MAX_TURNS.
+    """
+    rng = random.Random(seed)
+    clock = SimClock()
+    room = Room("SIMU", "p0", seed=rng.getrandbits(64), rules=rules)
+    room.clock = clock
+    for i in range(1, players):
+        room.add_player(f"p{i}")
+
+    room.start_selection_phase()
+    for p in room.players:
+        hand = [(room.catalog.name(c), room.catalog.type_name(c)) for c in p.initial_cards]
+        room.submit_selection(p.user, model.choose(rng, hand, rules.keep_size))
+
+    # Each team's members give clues in turn
+    next_giver = {1: 0, 2: 0}
+    turns = [0, 0, 0]
+    seconds = [0.0, 0.0, 0.0]
+    for _ in range(MAX_TURNS):
+        if room.game_state == "FINISHED":
+            return room.team_one_score, room.team_two_score, turns, seconds
+        round_number = int(room.game_state[-1])
+        team = room.current_captain_chooser.team
+        members = room.teams[team]
+        giver = room.players[members[next_giver[team] % len(members)]]
+        next_giver[team] += 1
+
+        turn_start = clock.now
+        room.set_clue_giver(giver.user)
+        turns[round_number - 1] += 1
+        while room.current_clue_giver:
+            card_type = room.catalog.type_name(room.card_in_play)
+            action = model.action(rng, round_number, card_type)
+            if action == "skip" and round_number == 1:
+                action = "guess"
+            spent = model.seconds(rng, round_number, card_type, action)
+            if clock.now + spent > room.turn_end_timestamp:
+                clock.now = room.turn_end_timestamp
+                room.expire_turn(room.turn_id)
+                break
+            clock.now += spent
+            if action == "guess":
+                room.guess_correct()
+            elif action == "skip":
+                room.skip_card()
+            else:
+                room.taboo_guess()
+        seconds[round_number - 1] += clock.now - turn_start
+    return None
+
+
+# ---------------- AGGREGATION ---------------- #
+
+def new_totals():
+    return {
+        "matches": 0,
+        "unfinished": 0,
+        "winner": Counter(),
+        "score_difference": Counter(),  # |team one - team two|
+        "total_points": Counter(),
+        "turns": [Counter(), Counter(), Counter()],
+        "round_seconds": [Counter(), Counter(), Counter()],  # Bucketed by EXHAUSTION_BUCKET
+    }
+
+
+def add_match(totals, result):
+    totals["matches"] += 1
+    if result is None:
+        totals["unfinished"] += 1
+        return
+    one, two, turns, seconds = result
+    totals["winner"]["team_one" if one > two else "team_two" if two > one else "tie"] += 1
+    totals["score_difference"][abs(one - two)] += 1
+    totals["total_points"][one + two] += 1
+    for r in range(3):
+        totals["turns"][r][turns[r]] += 1
+        totals["round_seconds"][r][int(seconds[r] // EXHAUSTION_BUCKET) * EXHAUSTION_BUCKET] += 1
+
+
+def merge(totals, other):
+    totals["matches"] += other["matches"]
+    totals["unfinished"] += other["unfinished"]
+    for key in ("winner", "score_difference", "total_points"):
+        totals[key].update(other[key])
+    for key in ("turns", "round_seconds"):
+        for mine, theirs in zip(totals[key], other[key]):
+            mine.update(theirs)
+
+
+def run_chunk(first_seed, count, players, rules, model):
+    """Worker process entry: plays 'count' matches with consecutive seeds."""
+    totals = new_totals()
+    for seed in range(first_seed, first_seed + count):
+        add_match(totals, play_match(seed, players, rules, model))
+    return totals
+
+
+def distribution(counter):
+    """Mean and percentiles of a value -> count histogram."""
+    total = sum(counter.values())
+    if not total:
+        return {}
+    values = sorted(counter.items())
+    mean = sum(value * count for value, count in values) / total
+
+    def at(q):
+        seen = 0
+        for value, count in values:
+            seen += count
+            if seen > q * total:
+                return value
+        return values[-1][0]
+
+    return {"mean": round(mean, 3), "p5": at(0.05), "p50": at(0.50), "p95": at(0.95), "max": values[-1][0]}
+
+
+def report(totals):
+    matches = totals["matches"] - totals["unfinished"]
+    return {
+        "matches": totals["matches"],
+        "unfinished": totals["unfinished"],
+        "win_rate": {k: round(v / matches, 4) for k, v in sorted(totals["winner"].items())} if matches else {},
+        "score_difference": distribution(totals["score_difference"]),
+        "total_points": distribution(totals["total_points"]),
+        "turns_per_round": [distribution(c) for c in totals["turns"]],
+        "deck_exhaustion_seconds": [distribution(c) for c in totals["round_seconds"]],
+    }
+
+
+# ---------------- RUNNER ---------------- #
+
+def simulate(matches, players, rules, model, seed=1, processes=None, chunk=500):
+    """Plays 'matches' matches over a process pool (processes=1 runs inline). Returns the totals."""
+    chunks = [(seed + start, min(chunk, matches - start)) for start in range(0, matches, chunk)]
+    totals = new_totals()
+    if processes == 1:
+        for first_seed, count in chunks:
+            merge(totals, run_chunk(first_seed, count, players, rules, model))
+        return totals
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(run_chunk, first_seed, count, players, rules, model) for first_seed, count in chunks]
+        for future in futures:
+            merge(totals, future.result())
+    return totals
+
+
+def int_list(text):
+    return [int(v) for v in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate Clue & Cue matches to tune the rules.")
+    parser.add_argument("--matches", type=int, default=10000, help="Matches per configuration")
+    parser.add_argument("--players", default="6", help="Comma separated player counts")
+    parser.add_argument("--turn-seconds", default=str(DEFAULT_RULES.turn_seconds), help="Comma separated")
+    parser.add_argument("--hand-size", default=str(DEFAULT_RULES.hand_size), help="Comma separated")
+    parser.add_argument("--keep-size", default=str(DEFAULT_RULES.keep_size), help="Comma separated")
+    parser.add_argument("--max-per-type", type=int, default=DEFAULT_RULES.max_cards_per_type)
+    parser.add_argument("--model", default="casual", help=f"{', '.join(MODELS)} or module:attribute")
+    parser.add_argument("--type-factor", action="append", default=[], metavar="TYPE=FACTOR",
+                        help="Scale guess times for a card type (repeatable)")
+    parser.add_argument("--processes", type=int, help="Worker processes (default: CPU count, 1 = inline)")
+    parser.add_argument("--chunk", type=int, default=500, help="Matches per task")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    type_factor = {}
+    for item in args.type_factor:
+        name, _, factor = item.rpartition("=")
+        type_factor[name] = float(factor)
+    model = load_model(args.model, type_factor)
+
+    runs = []
+    for players in int_list(args.players):
+        for turn_seconds in int_list(args.turn_seconds):
+            for hand_size in int_list(args.hand_size):
+                for keep_size in int_list(args.keep_size):
+                    rules = Rules(turn_seconds, hand_size, keep_size, args.max_per_type)
+                    start = time.perf_counter()
+                    totals = simulate(args.matches, players, rules, model, args.seed, args.processes, args.chunk)
+                    elapsed = time.perf_counter() - start
+                    run = {"players": players, "turn_seconds": turn_seconds, "hand_size": hand_size,
+                           "keep_size": keep_size, "max_cards_per_type": args.max_per_type,
+                           "seconds": round(elapsed, 3)}
+                    run.update(report(totals))
+                    print(f"[SIMULATE] {players} players, {turn_seconds}s turns, keep {keep_size}/{hand_size}: "
+                          f"{args.matches / elapsed:.0f} matches/s, turns {[t.get('mean') for t in run['turns_per_round']]}",
+                          file=sys.stderr)  # LOG
+                    runs.append(run)
+
+    text = json.dumps({"model": args.model, "type_factor": type_factor, "seed": args.seed, "runs": runs}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()